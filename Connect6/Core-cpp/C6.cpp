@@ -2,10 +2,30 @@
 #include <vector>
 #include <algorithm>
 #include <chrono>
+#include <string>
+#include <sstream>
+#include <fstream>
+#include <thread>
+#include <mutex>
+#include <atomic>
+#include <cstdint>
+#include <cstring>
+#include <memory>
+#ifdef _WIN32
+#define NOMINMAX // 否则 windows.h 定义的 min/max 宏会破坏 numeric_limits<T>::max()
+#define WIN32_LEAN_AND_MEAN
+#include <windows.h>
+#else
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
 
 using namespace std;
 
-#define GRID_SIZE 9 // 棋盘大小
+#define MAX_GRID_SIZE 19 // 支持的最大棋盘大小
+#define DEFAULT_GRID_SIZE 9 // 默认棋盘大小
 #define EMPTY_CELL 0 // 空格标志
 #define BLACK_PIECE 1 // 黑棋标志
 #define WHITE_PIECE (-1) // 白棋标志
@@ -14,25 +34,48 @@ const int INFINITY_VALUE = numeric_limits<int>::max() - 1; // 无穷大
 
 // 设置搜索最长时间为 2 秒
 const int MAX_SEARCH_TIME_MS = 2000; // 单位：毫秒
+int search_time_ms = MAX_SEARCH_TIME_MS; // 本次搜索的时间预算，可由 go 命令指定
 
 // 记录搜索开始时间
 auto search_start_time = chrono::high_resolution_clock::now();
+atomic<bool> stop_requested(false); // 外部要求停止搜索（stop 命令）
+atomic<bool> helpers_stop(false); // 主搜索线程结束后通知辅助线程停止
+long long node_limit = 0; // 节点数上限，非 0 时忽略时间预算（单线程下结果可复现）
+
+// 多线程搜索（Lazy SMP）：各线程在同一根局面上独立迭代加深，只通过共享的置换表交换结果。
+// 以下标注 thread_local 的变量是每个搜索线程私有的局面和搜索状态。
+#define MAX_THREADS 64
+int search_threads = 1; // 搜索线程数，1 为单线程
+thread_local bool is_helper_thread = false; // 当前线程是否为辅助搜索线程
+thread_local bool is_ponder_thread = false; // 当前线程是否在后台思考，不输出每轮迭代的信息
+
+// 迭代加深搜索
+#define MAX_SEARCH_DEPTH 32 // 迭代加深的最大深度（回合数）
+#define MAX_CANDIDATES 16 // 搜索时每步考虑的候选点数上限
+int candidate_limit = 12; // 搜索时每步考虑的候选点数（可调参数 candidates）
+#define TIME_CHECK_INTERVAL 1024 // 每搜索这么多节点检查一次时钟
+thread_local long long nodes_searched = 0; // 本次决策搜索的节点数
+thread_local bool search_aborted = false; // 本轮迭代因超时或 stop 被中断，其结果不可用
+thread_local long long beta_cutoffs = 0; // 本次决策发生的 beta 剪枝次数
+thread_local int completed_depth = 0; // 最近一轮完整完成的迭代深度
+thread_local int best_score = 0; // 最近一轮完整完成的迭代给出的分数
 
 // 判断是否超时
 bool IsTimeUp() {
+    if (stop_requested.load(memory_order_relaxed)) return true;
+    if (is_helper_thread && helpers_stop.load(memory_order_relaxed)) return true;
+    if (node_limit > 0) return nodes_searched >= node_limit;
     auto current_time = chrono::high_resolution_clock::now();
     auto elapsed_time = chrono::duration_cast<chrono::milliseconds>(current_time - search_start_time).count();
-    return elapsed_time >= MAX_SEARCH_TIME_MS;
+    return elapsed_time >= search_time_ms;
 }
 
-// 棋盘边界
-int top_boundary = GRID_SIZE; // 上边界
-int bottom_boundary = 0; // 下边界
-int left_boundary = GRID_SIZE; // 左边界
-int right_boundary = 0; // 右边界
-
+int grid_size = DEFAULT_GRID_SIZE; // 棋盘大小，可由 --size 参数或 set size 命令设置
 int bot_color; // 当前机器人执棋颜色（1为黑，-1为白）
-int board_state[GRID_SIZE][GRID_SIZE] = { 0 }; // 棋盘状态，先x后y
+thread_local int board_state[MAX_GRID_SIZE][MAX_GRID_SIZE] = { 0 }; // 棋盘状态，先x后y
+thread_local uint32_t row_bits[2][MAX_GRID_SIZE]; // 位棋盘：黑、白每行的棋子，第 x 位为 (x, y)
+int stone_count = 0; // 棋盘上的棋子总数
+int side_to_move = BLACK_PIECE; // 常驻模式下轮到落子的一方
 
 // 棋步结构体
 struct Move {
@@ -45,23 +88,240 @@ struct MoveWithScore {
     int score; // 棋步对应的评分
     Move move; // 棋步
 };
-vector<MoveWithScore> legal_moves; // 存储所有合法棋步
-Move optimal_moves[2]; // 最终决策的两步棋
-vector<Move> simulated_moves; // 模拟落子的棋步
+thread_local vector<MoveWithScore> legal_moves; // 存储所有合法棋步
+thread_local Move optimal_moves[2]; // 最终决策的两步棋
+
+// ---------------- 增量评估 ----------------
+// 棋盘上所有连续六格（“路”）预先编号，每条路记录黑白双方的棋子数；
+// 落子和撤子时只更新经过该点的路（每点至多 24 条），并同步维护双方的累计得分。
+#define WINDOW_LENGTH 6
+#define MAX_WINDOWS (4 * MAX_GRID_SIZE * MAX_GRID_SIZE) // 路的数量上限
+#define MAX_CELL_WINDOWS (4 * WINDOW_LENGTH) // 经过一个点的路的数量上限
+
+// 一条路中只有一方棋子时的得分，下标为棋子数（6 即连成六子）；1 到 5 为可调参数 line_self_N / line_opponent_N
+int eval_self_scores[WINDOW_LENGTH + 1] = { 0, 1, 20, 40, 2000, 2000, 100000 };
+int eval_opponent_scores[WINDOW_LENGTH + 1] = { 0, 1, 15, 30, 150, 5000, 90000 };
+// 初始评估（落子排序）时经过该点的路上只有一方棋子的得分，下标为棋子数减一；可调参数 order_self_N / order_opponent_N
+int initial_self_scores[WINDOW_LENGTH - 1] = { 20, 45, 50, 1000000, 1000000 };
+int initial_opponent_scores[WINDOW_LENGTH - 1] = { 1, 15, 30, 900000, 900000 };
+
+// 棋型表：一条路的得分只取决于路上的黑、白棋子数（棋型），两个分值表按棋型预先展开。
+// 落子/撤子时每条路只需按棋型查一次表，取出四项累计得分的增量；初始评估同样按棋型直接查表。
+#define PATTERN_COUNT ((WINDOW_LENGTH + 1) * (WINDOW_LENGTH + 1))
+
+// 累计得分的一组增量
+struct PatternDelta {
+    int self_score[2];
+    int opponent_score[2];
+};
+PatternDelta pattern_add_deltas[PATTERN_COUNT][2]; // 在该棋型的路上落下黑、白棋子时累计得分的变化
+int pattern_move_scores[PATTERN_COUNT][2]; // 黑、白方在经过该棋型的路的空点上落子的初始评分
+
+inline int PatternIndex(int black, int white) {
+    return black * (WINDOW_LENGTH + 1) + white;
+}
+
+int window_count = 0; // 路的数量
+thread_local int window_stones[MAX_WINDOWS][2]; // 每条路上黑、白棋子数
+int cell_window_count[MAX_GRID_SIZE][MAX_GRID_SIZE]; // 经过每个点的路数
+int cell_windows[MAX_GRID_SIZE][MAX_GRID_SIZE][MAX_CELL_WINDOWS]; // 经过每个点的路的编号
+Move window_cells[MAX_WINDOWS][WINDOW_LENGTH]; // 每条路上的六个点
+thread_local int self_line_score[2]; // 只含一方棋子的路按己方分值表累计的得分（黑、白）
+thread_local int opponent_line_score[2]; // 同上，按对方分值表累计的得分
+
+// ---------------- Zobrist 哈希 ----------------
+uint64_t zobrist_keys[MAX_GRID_SIZE][MAX_GRID_SIZE][2]; // 每个点、每种颜色的随机键
+uint64_t zobrist_side_key; // 轮到白方时附加的键
+thread_local uint64_t position_hash = 0; // 当前局面的哈希，随落子增量维护
+
+// SplitMix64 伪随机数，保证每次运行生成相同的键
+uint64_t NextRandom(uint64_t& seed) {
+    uint64_t z = (seed += 0x9E3779B97F4A7C15ULL);
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL;
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL;
+    return z ^ (z >> 31);
+}
+
+void InitZobrist() {
+    uint64_t seed = 20240601;
+    for (auto& column : zobrist_keys)
+        for (auto& cell : column)
+            for (uint64_t& key : cell) key = NextRandom(seed);
+    zobrist_side_key = NextRandom(seed);
+}
+
+// 棋子颜色对应的下标（黑 0，白 1）
+inline int ColorIndex(int piece_color) {
+    return piece_color == BLACK_PIECE ? 0 : 1;
+}
 
 // 判断是否在棋盘内
 inline bool IsWithinBoard(int x, int y) {
-    return x >= 0 && x < GRID_SIZE && y >= 0 && y < GRID_SIZE;
+    return x >= 0 && x < grid_size && y >= 0 && y < grid_size;
+}
+
+// 预先枚举棋盘上所有的路
+void InitWindows() {
+    const int directions[4][2] = { { 0, 1 }, { 1, 0 }, { 1, 1 }, { 1, -1 } };
+    window_count = 0;
+    for (auto& column : cell_window_count)
+        for (int& count : column) count = 0;
+    for (const auto& direction : directions) {
+        int dx = direction[0], dy = direction[1];
+        for (int x = 0; x < grid_size; x++) {
+            for (int y = 0; y < grid_size; y++) {
+                int end_x = x + (WINDOW_LENGTH - 1) * dx, end_y = y + (WINDOW_LENGTH - 1) * dy;
+                if (!IsWithinBoard(end_x, end_y)) continue;
+                for (int k = 0; k < WINDOW_LENGTH; k++) {
+                    int cx = x + k * dx, cy = y + k * dy;
+                    cell_windows[cx][cy][cell_window_count[cx][cy]++] = window_count;
+                    window_cells[window_count][k] = Move{ cx, cy };
+                }
+                window_count++;
+            }
+        }
+    }
+}
+
+// 一条路对累计得分的贡献：只含一方棋子的路才计分
+PatternDelta LineScores(int black, int white) {
+    PatternDelta scores{};
+    if (black && !white) {
+        scores.self_score[0] = eval_self_scores[black];
+        scores.opponent_score[0] = eval_opponent_scores[black];
+    } else if (white && !black) {
+        scores.self_score[1] = eval_self_scores[white];
+        scores.opponent_score[1] = eval_opponent_scores[white];
+    }
+    return scores;
+}
+
+// 展开棋型表
+void InitPatternTables() {
+    for (int black = 0; black <= WINDOW_LENGTH; black++) {
+        for (int white = 0; black + white <= WINDOW_LENGTH; white++) {
+            int pattern = PatternIndex(black, white);
+            for (int color = 0; color < 2; color++) {
+                pattern_add_deltas[pattern][color] = PatternDelta{};
+                pattern_move_scores[pattern][color] = 0;
+                if (black + white == WINDOW_LENGTH) continue; // 路已下满
+                PatternDelta before = LineScores(black, white);
+                PatternDelta after = LineScores(black + (color == 0), white + (color == 1));
+                for (int side = 0; side < 2; side++) {
+                    pattern_add_deltas[pattern][color].self_score[side] = after.self_score[side] - before.self_score[side];
+                    pattern_add_deltas[pattern][color].opponent_score[side] =
+                        after.opponent_score[side] - before.opponent_score[side];
+                }
+                int self_count = color == 0 ? black : white, opponent_count = color == 0 ? white : black;
+                if (self_count && !opponent_count) pattern_move_scores[pattern][color] = initial_self_scores[self_count - 1];
+                if (!self_count && opponent_count)
+                    pattern_move_scores[pattern][color] = initial_opponent_scores[opponent_count - 1];
+            }
+        }
+    }
+}
+
+// 按当前分值表从各路的棋子数重新计算累计得分（分值表改变后调用）
+void RecomputeLineScores() {
+    for (int side = 0; side < 2; side++) self_line_score[side] = opponent_line_score[side] = 0;
+    for (int window = 0; window < window_count; window++) {
+        PatternDelta scores = LineScores(window_stones[window][0], window_stones[window][1]);
+        for (int side = 0; side < 2; side++) {
+            self_line_score[side] += scores.self_score[side];
+            opponent_line_score[side] += scores.opponent_score[side];
+        }
+    }
+}
+
+// ---------------- 可调参数 ----------------
+// 评估分值表与候选点数以参数的形式开放，可由 set <名称> <值> 逐个设置，或从参数文件（每行“名称 值”，# 开头为注释）载入，
+// 供自动调参工具使用。修改分值后重新展开棋型表，并按新分值重算当前局面的累计得分，
+// 对局中途修改也与重新计算的评估一致（置换表等按旧分值得到的结果由调用方丢弃）。
+struct Parameter {
+    string name;
+    int* value;
+    int min_value;
+    int max_value;
+};
+vector<Parameter> parameters;
+
+void InitParameters() {
+    parameters.clear();
+    for (int count = 1; count < WINDOW_LENGTH; count++) {
+        parameters.push_back({ "line_self_" + to_string(count), &eval_self_scores[count], 0, 200000 });
+        parameters.push_back({ "line_opponent_" + to_string(count), &eval_opponent_scores[count], 0, 200000 });
+        parameters.push_back({ "order_self_" + to_string(count), &initial_self_scores[count - 1], 0, 2000000 });
+        parameters.push_back({ "order_opponent_" + to_string(count), &initial_opponent_scores[count - 1], 0, 2000000 });
+    }
+    parameters.push_back({ "candidates", &candidate_limit, 4, MAX_CANDIDATES });
+}
+
+// 设置一个参数，名称未知或超出范围时返回 false
+bool SetParameter(const string& name, int value) {
+    for (const Parameter& parameter : parameters) {
+        if (parameter.name != name) continue;
+        if (value < parameter.min_value || value > parameter.max_value) return false;
+        *parameter.value = value;
+        InitPatternTables();
+        RecomputeLineScores();
+        return true;
+    }
+    return false;
+}
+
+// 从参数文件载入参数，出错时在 error 中给出原因；出错前已读到的参数保持生效
+bool LoadParameters(const string& path, string& error) {
+    ifstream file(path);
+    if (!file) {
+        error = "cannot open " + path;
+        return false;
+    }
+    string line;
+    while (getline(file, line)) {
+        istringstream fields(line);
+        string name;
+        int value;
+        if (!(fields >> name) || name[0] == '#') continue;
+        if (!(fields >> value) || !SetParameter(name, value)) {
+            error = "bad parameter " + name;
+            return false;
+        }
+    }
+    return true;
+}
+
+// 将一组增量计入（sign 为 1）或扣除（sign 为 -1）累计得分
+inline void ApplyPatternDelta(const PatternDelta& delta, int sign) {
+    self_line_score[0] += sign * delta.self_score[0];
+    self_line_score[1] += sign * delta.self_score[1];
+    opponent_line_score[0] += sign * delta.opponent_score[0];
+    opponent_line_score[1] += sign * delta.opponent_score[1];
+}
+
+// 在空点落下一颗棋子，增量更新经过该点的路
+void MakeMove(int x, int y, int piece_color) {
+    board_state[x][y] = piece_color;
+    int color = ColorIndex(piece_color);
+    row_bits[color][y] |= 1u << x;
+    position_hash ^= zobrist_keys[x][y][color];
+    for (int k = 0; k < cell_window_count[x][y]; k++) {
+        int* stones = window_stones[cell_windows[x][y][k]];
+        ApplyPatternDelta(pattern_add_deltas[PatternIndex(stones[0], stones[1])][color], 1);
+        stones[color]++;
+    }
 }
 
-// 获取某条道的棋子
-vector<int> GetLinePieces(Move move, int dx, int dy) {
-    vector<int> line;
-    for (int i = -5; i <= 5; i++) {
-        int x = move.x + i * dx, y = move.y + i * dy;
-        if (IsWithinBoard(x, y)) line.push_back(board_state[x][y]);
+// 撤回 MakeMove 落下的棋子
+void UnmakeMove(int x, int y) {
+    int color = ColorIndex(board_state[x][y]);
+    row_bits[color][y] &= ~(1u << x);
+    position_hash ^= zobrist_keys[x][y][color];
+    for (int k = 0; k < cell_window_count[x][y]; k++) {
+        int* stones = window_stones[cell_windows[x][y][k]];
+        stones[color]--;
+        ApplyPatternDelta(pattern_add_deltas[PatternIndex(stones[0], stones[1])][color], -1);
     }
-    return line;
+    board_state[x][y] = EMPTY_CELL;
 }
 
 // 在坐标处落子，检查模拟落子是否合法
@@ -70,7 +330,7 @@ bool PlacePiece(int x0, int y0, int x1, int y1, int piece_color, bool check_only
         if (!IsWithinBoard(x0, y0) || board_state[x0][y0] != EMPTY_CELL)
             return false;
         if (!check_only) {
-            board_state[x0][y0] = piece_color;
+            MakeMove(x0, y0, piece_color);
         }
         return true;
     } else { // 双步落子
@@ -79,42 +339,22 @@ bool PlacePiece(int x0, int y0, int x1, int y1, int piece_color, bool check_only
         if (board_state[x0][y0] != EMPTY_CELL || board_state[x1][y1] != EMPTY_CELL)
             return false;
         if (!check_only) {
-            board_state[x0][y0] = piece_color;
-            board_state[x1][y1] = piece_color;
+            MakeMove(x0, y0, piece_color);
+            MakeMove(x1, y1, piece_color);
         }
         return true;
     }
 }
 
-// 初始评估函数
+// 初始评估函数：按经过该点的每条路的棋型查表评分
 int EvaluateInitialMove(Move move, int player) {
-    // 设置敌我双方各种路分数
-    int self_scores[5] = { 20, 45, 50, 1000000, 1000000 };
-    int opponent_scores[5] = { 1, 15, 30, 900000, 900000 };
-
-    // 计算某条道的分值
-    auto CalculateLineScore = [&](vector<int>& line) {
-        int score = 0, num = (int)line.size();
-        while (num < 6) line.push_back(2), num++;
-        for (int i = 0; i <= num - 6; i++) {
-            int self_count = 0, opponent_count = 0;
-            for (int j = i; j < i + 6; j++) {
-                if (line[j] == player) self_count++;
-                else if (line[j] == -player) opponent_count++;
-            }
-            if (self_count && !opponent_count) score += self_scores[self_count - 1];
-            if (!self_count && opponent_count) score += opponent_scores[opponent_count - 1];
-        }
-        return score;
-    };
-
-    // 计算四种道的分值
-    vector<int> vertical_line = GetLinePieces(move, 0, 1); // 竖道
-    vector<int> horizontal_line = GetLinePieces(move, 1, 0); // 横道
-    vector<int> diagonal_line1 = GetLinePieces(move, 1, 1); // 左上右下
-    vector<int> diagonal_line2 = GetLinePieces(move, 1, -1); // 左下右上
-    return CalculateLineScore(vertical_line) + CalculateLineScore(horizontal_line) +
-           CalculateLineScore(diagonal_line1) + CalculateLineScore(diagonal_line2);
+    int color = ColorIndex(player);
+    int score = 0;
+    for (int k = 0; k < cell_window_count[move.x][move.y]; k++) {
+        const int* stones = window_stones[cell_windows[move.x][move.y][k]];
+        score += pattern_move_scores[PatternIndex(stones[0], stones[1])][color];
+    }
+    return score;
 }
 
 // 比较函数，用于排序棋步
@@ -122,121 +362,1359 @@ bool CompareMoves(const MoveWithScore& a, const MoveWithScore& b) {
     return a.score > b.score;
 }
 
-// 生成所有合法棋步
-void GenerateLegalMoves(int player) {
+// 第 y 行中与已有棋子的距离（横、竖、斜方向均计）不超过 distance 的空点：
+// 先合并上下 distance 行的棋子，再左右各扩展 distance 位。occupied 为各行双方棋子的并集。
+inline uint32_t NearbyEmptyCells(const uint32_t occupied[], int y, int distance) {
+    uint32_t rows = 0;
+    for (int ny = max(y - distance, 0); ny <= min(y + distance, grid_size - 1); ny++) rows |= occupied[ny];
+    uint32_t nearby = rows;
+    for (int d = 1; d <= distance; d++) nearby |= (rows << d) | (rows >> d);
+    return nearby & ((1u << grid_size) - 1) & ~occupied[y];
+}
+
+// 生成所有合法棋步：只考虑与已有棋子的距离不超过 distance 的空点，候选范围由位棋盘按行求出。
+void GenerateLegalMoves(int player, int distance) {
+    legal_moves.clear();
+    uint32_t occupied[MAX_GRID_SIZE];
+    for (int y = 0; y < grid_size; y++) occupied[y] = row_bits[0][y] | row_bits[1][y];
     // 遍历棋盘，将合法棋步存入legal_moves数组
-    for (int y = top_boundary; y <= bottom_boundary; y++) {
-        for (int x = left_boundary; x <= right_boundary; x++) {
-            if (board_state[x][y] == EMPTY_CELL) {
-                Move move{};
-                move.x = x;
-                move.y = y;
-                int score = EvaluateInitialMove(move, player); // 计算初始评分
-                MoveWithScore temp{};
-                temp.move = move;
-                temp.score = score;
-                legal_moves.push_back(temp);
-            }
+    for (int y = 0; y < grid_size; y++) {
+        uint32_t nearby = NearbyEmptyCells(occupied, y, distance);
+        for (int x = 0; nearby >> x; x++) {
+            if (!((nearby >> x) & 1)) continue;
+            Move move{ x, y };
+            int score = EvaluateInitialMove(move, player); // 计算初始评分
+            MoveWithScore temp{};
+            temp.move = move;
+            temp.score = score;
+            legal_moves.push_back(temp);
         }
     }
+    // 附近的点已经下满时扩大到整个棋盘
+    if (legal_moves.size() < 2 && distance < grid_size) {
+        GenerateLegalMoves(player, grid_size);
+        return;
+    }
     // 将合法棋步按评分由高到低排序
     sort(legal_moves.begin(), legal_moves.end(), CompareMoves);
 }
 
-// 计算某条道的分值
-int CalculateLineScore(const vector<int>& line, int player) {
-    int self_scores[6] = { 1, 20, 40, 2000, 2000, 100000 };
-    int opponent_scores[6] = { 1, 15, 30, 150, 5000, 90000 };
-    int self_pre_score = 0, self_post_score = 0; //模拟落子前后得分
-    int opponent_pre_score = 0, opponent_post_score = 0;
+// 评估函数：己方按己方分值表的得分减去对方按对方分值表的得分，随落子增量维护
+inline int EvaluateBoard(int player) {
+    return self_line_score[ColorIndex(player)] - opponent_line_score[ColorIndex(-player)];
+}
+
+// ---------------- 置换表 ----------------
+// 同一局面可由不同的落子顺序到达（如先下 a 后下 b 与先下 b 后下 a），
+// 置换表按 Zobrist 哈希记录已搜索局面的深度、分数类型和最佳两步棋，用于剪枝和排序。
+// 每个表项压缩为两个 64 位整数，键与数据异或存放，多线程无锁读写时，
+// 读到被并发写坏的表项会因键校验失败而被当作未命中。
+#define BOUND_EXACT 0 // 精确值
+#define BOUND_LOWER 1 // 下界（发生 beta 剪枝）
+#define BOUND_UPPER 2 // 上界（没有棋步超过 alpha）
+#define BUCKET_SIZE 4 // 每个桶的表项数
+#define DEFAULT_HASH_MB 16 // 默认置换表大小
 
-    int num = (int)line.size();
-    for (int i = 0; i <= num - 6; i++) {
-        int self_count = 0, opponent_count = 0;
-        for (int j = i; j < i + 6; j++) {
-            if (line[j] == player) self_count++;
-            else if (line[j] == -player) opponent_count++;
+struct TTEntry {
+    atomic<uint64_t> key; // 局面键 ^ data
+    atomic<uint64_t> data; // 分数(32) | 深度(8) | 类型(2) | 代(2) | 两步棋(4x5)
+};
+
+// 解包后的置换表数据
+struct TTData {
+    int score;
+    int depth;
+    int bound;
+    int generation;
+    Move moves[2];
+};
+
+struct TTBucket {
+    TTEntry entries[BUCKET_SIZE];
+};
+
+unique_ptr<TTBucket[]> transposition_table;
+uint64_t tt_bucket_count = 0;
+uint64_t tt_bucket_mask = 0;
+int tt_generation = 0; // 每次决策加一，用于淘汰旧局面
+
+// 置换表命中率统计（每个线程各自计数，搜索结束后汇总）
+thread_local long long tt_probes = 0; // 查询次数
+thread_local long long tt_hits = 0; // 命中次数
+thread_local long long tt_cutoffs = 0; // 命中后直接剪枝的次数
+thread_local long long tt_stores = 0; // 写入次数
+thread_local long long tt_overwrites = 0; // 覆盖其他局面的次数
+
+void ClearTranspositionTable() {
+    for (uint64_t i = 0; i < tt_bucket_count; i++) {
+        for (TTEntry& entry : transposition_table[i].entries) {
+            entry.key.store(0, memory_order_relaxed);
+            entry.data.store(0, memory_order_relaxed);
         }
-        if (opponent_count == 0) {
-            if (self_count > 0) self_post_score += self_scores[self_count - 1];
-            if (self_count > 1) self_pre_score += self_scores[self_count - 2];
-        } else if (self_count == 0) {
-            opponent_post_score += opponent_scores[opponent_count - 1];
-            if (opponent_count > 1) opponent_pre_score += opponent_scores[opponent_count - 2];
+    }
+    tt_generation = 0;
+}
+
+// 按 MB 分配置换表（桶数取 2 的幂）
+void ResizeTranspositionTable(int size_mb) {
+    uint64_t buckets = 1;
+    uint64_t limit = max<uint64_t>((uint64_t)size_mb * 1024 * 1024 / sizeof(TTBucket), 1);
+    while (buckets * 2 <= limit) buckets *= 2;
+    transposition_table.reset(new TTBucket[buckets]);
+    tt_bucket_count = buckets;
+    tt_bucket_mask = buckets - 1;
+    ClearTranspositionTable();
+}
+
+void ResetTTStats() {
+    tt_probes = tt_hits = tt_cutoffs = tt_stores = tt_overwrites = 0;
+}
+
+// 当前局面（含轮到哪方）的置换表键，0 留作空表项
+inline uint64_t PositionKey(int player) {
+    uint64_t key = position_hash ^ (player == WHITE_PIECE ? zobrist_side_key : 0);
+    return key ? key : 1;
+}
+
+inline uint64_t PackCoordinate(int v) {
+    return v < 0 ? 31 : (uint64_t)v;
+}
+
+inline int UnpackCoordinate(uint64_t bits) {
+    return bits == 31 ? -1 : (int)bits;
+}
+
+uint64_t PackTTData(int score, int depth, int bound, const Move moves[2]) {
+    uint64_t data = (uint32_t)score;
+    data |= (uint64_t)(depth & 0xFF) << 32;
+    data |= (uint64_t)bound << 40;
+    data |= (uint64_t)(tt_generation & 3) << 42;
+    data |= PackCoordinate(moves[0].x) << 44;
+    data |= PackCoordinate(moves[0].y) << 49;
+    data |= PackCoordinate(moves[1].x) << 54;
+    data |= PackCoordinate(moves[1].y) << 59;
+    return data;
+}
+
+TTData UnpackTTData(uint64_t data) {
+    TTData result{};
+    result.score = (int)(uint32_t)(data & 0xFFFFFFFFULL);
+    result.depth = (int)((data >> 32) & 0xFF);
+    result.bound = (int)((data >> 40) & 3);
+    result.generation = (int)((data >> 42) & 3);
+    result.moves[0] = Move{ UnpackCoordinate((data >> 44) & 31), UnpackCoordinate((data >> 49) & 31) };
+    result.moves[1] = Move{ UnpackCoordinate((data >> 54) & 31), UnpackCoordinate((data >> 59) & 31) };
+    return result;
+}
+
+// 查询置换表，命中时写入 result
+bool ProbeTransposition(uint64_t key, TTData& result) {
+    tt_probes++;
+    TTBucket& bucket = transposition_table[key & tt_bucket_mask];
+    for (const TTEntry& entry : bucket.entries) {
+        uint64_t data = entry.data.load(memory_order_relaxed);
+        if ((entry.key.load(memory_order_relaxed) ^ data) == key) {
+            tt_hits++;
+            result = UnpackTTData(data);
+            return true;
         }
     }
-    return self_post_score - self_pre_score - (opponent_post_score - opponent_pre_score); //返回模拟落子后的总得分
+    return false;
 }
 
-// 评估函数
-int EvaluateBoard(int player) {
-    int total_score = 0;
-    for (const auto& move : simulated_moves) {
-        total_score += CalculateLineScore(GetLinePieces(move, 0, 1), player);  // 竖道
-        total_score += CalculateLineScore(GetLinePieces(move, 1, 0), player);  // 横道
-        total_score += CalculateLineScore(GetLinePieces(move, 1, 1), player);  // 左上右下
-        total_score += CalculateLineScore(GetLinePieces(move, 1, -1), player); // 左下右上
+// 写入置换表：优先覆盖同一局面或空表项，否则替换旧代中最浅的表项
+void StoreTransposition(uint64_t key, int score, int depth, int bound, const Move moves[2]) {
+    TTBucket& bucket = transposition_table[key & tt_bucket_mask];
+    TTEntry* target = nullptr;
+    int worst_value = numeric_limits<int>::max();
+    uint64_t target_key = 0;
+    for (TTEntry& entry : bucket.entries) {
+        uint64_t data = entry.data.load(memory_order_relaxed);
+        uint64_t stored_key = entry.key.load(memory_order_relaxed);
+        uint64_t entry_key = stored_key ^ data;
+        if (entry_key == key || stored_key == 0) {
+            if (entry_key == key && UnpackTTData(data).depth > depth && bound != BOUND_EXACT)
+                return; // 保留更深的结果
+            target = &entry;
+            target_key = stored_key == 0 ? 0 : entry_key;
+            break;
+        }
+        TTData old = UnpackTTData(data);
+        int value = old.depth - (old.generation == (tt_generation & 3) ? 0 : 64);
+        if (value < worst_value) {
+            worst_value = value;
+            target = &entry;
+            target_key = entry_key;
+        }
+    }
+    if (target_key != 0 && target_key != key) tt_overwrites++;
+    uint64_t data = PackTTData(score, depth, bound, moves);
+    target->key.store(key ^ data, memory_order_relaxed);
+    target->data.store(data, memory_order_relaxed);
+    tt_stores++;
+}
+
+// 置换表占用率（千分比，抽样前 1000 个桶）
+int TranspositionFill() {
+    int used = 0, sampled = 0;
+    for (uint64_t i = 0; i < tt_bucket_count && i < 1000; i++) {
+        for (const TTEntry& entry : transposition_table[i].entries) {
+            sampled++;
+            if (entry.key.load(memory_order_relaxed) != 0 &&
+                UnpackTTData(entry.data.load(memory_order_relaxed)).generation == (tt_generation & 3)) used++;
+        }
+    }
+    return sampled ? used * 1000 / sampled : 0;
+}
+
+thread_local int root_depth = 2; // 本轮迭代的根节点搜索深度
+
+// ---------------- 两步棋生成与排序 ----------------
+// 每层从评分最高的 candidate_limit 个候选点中两两组合出无序的两步棋，每对只搜索一次。
+// 根节点的候选点取自 legal_moves；其余各层按当前（含模拟落子的）局面由位棋盘重新生成，
+// 因此更深的迭代也会考虑模拟落子附近的点。
+// 排序依次为：置换表给出的棋步、本层的杀手棋步、其余两步棋按配合评分与历史得分由高到低。
+#define MAX_PAIRS (MAX_CANDIDATES * (MAX_CANDIDATES - 1) / 2) // 每层两步棋的数量上限
+#define KILLER_SLOTS 2 // 每层记录的杀手棋步数
+#define HISTORY_LIMIT 1000 // 历史得分上限，超过时全部减半
+
+// 两步棋及其排序评分
+struct PairWithScore {
+    int score;
+    Move moves[2];
+};
+
+thread_local Move killer_pairs[MAX_SEARCH_DEPTH][KILLER_SLOTS][2]; // 每层最近发生 beta 剪枝的两步棋
+thread_local int history_scores[MAX_GRID_SIZE][MAX_GRID_SIZE]; // 每个点参与 beta 剪枝的累计得分
+
+// 开始一次决策时清空杀手棋步和历史得分
+void ClearOrdering() {
+    for (auto& slots : killer_pairs)
+        for (auto& pair : slots) pair[0] = pair[1] = Move{ -1, -1 };
+    memset(history_scores, 0, sizeof(history_scores));
+}
+
+// 两对棋步是否相同（不计先后）
+inline bool SamePair(const Move a[2], const Move b[2]) {
+    return (a[0].x == b[0].x && a[0].y == b[0].y && a[1].x == b[1].x && a[1].y == b[1].y) ||
+           (a[0].x == b[1].x && a[0].y == b[1].y && a[1].x == b[0].x && a[1].y == b[0].y);
+}
+
+// 两步棋是否都落在空点上
+inline bool IsPlayablePair(const Move pair[2]) {
+    return pair[0].x >= 0 && pair[1].x >= 0 && (pair[0].x != pair[1].x || pair[0].y != pair[1].y) &&
+           board_state[pair[0].x][pair[0].y] == EMPTY_CELL && board_state[pair[1].x][pair[1].y] == EMPTY_CELL;
+}
+
+// 发生 beta 剪枝的两步棋记为本层的杀手棋步，两颗棋子各加历史得分
+void RecordCutoff(int ply, int depth, const Move pair[2]) {
+    Move (*killers)[2] = killer_pairs[ply];
+    if (!SamePair(killers[0], pair)) {
+        for (int k = KILLER_SLOTS - 1; k > 0; k--) {
+            killers[k][0] = killers[k - 1][0];
+            killers[k][1] = killers[k - 1][1];
+        }
+        killers[0][0] = pair[0];
+        killers[0][1] = pair[1];
+    }
+    bool overflow = false;
+    for (int k = 0; k < 2; k++) {
+        int& history = history_scores[pair[k].x][pair[k].y];
+        history += depth * depth;
+        overflow |= history > HISTORY_LIMIT;
+    }
+    if (overflow) {
+        for (auto& column : history_scores)
+            for (int& history : column) history /= 2;
     }
-    return total_score;
 }
 
+// 按当前局面选出 player 评分最高的 candidate_limit 个空点（与已有棋子距离不超过 2），返回数量
+int GenerateCandidates(int player, Move candidates[MAX_CANDIDATES]) {
+    uint32_t occupied[MAX_GRID_SIZE];
+    for (int y = 0; y < grid_size; y++) occupied[y] = row_bits[0][y] | row_bits[1][y];
+    MoveWithScore best[MAX_CANDIDATES];
+    int count = 0;
+    for (int y = 0; y < grid_size; y++) {
+        uint32_t nearby = NearbyEmptyCells(occupied, y, 2);
+        for (int x = 0; nearby >> x; x++) {
+            if (!((nearby >> x) & 1)) continue;
+            MoveWithScore move{ EvaluateInitialMove(Move{ x, y }, player), Move{ x, y } };
+            if (count == candidate_limit && move.score <= best[count - 1].score) continue;
+            // 插入排序，只保留前 candidate_limit 个
+            int i = count < candidate_limit ? count++ : count - 1;
+            for (; i > 0 && best[i - 1].score < move.score; i--) best[i] = best[i - 1];
+            best[i] = move;
+        }
+    }
+    for (int i = 0; i < count; i++) candidates[i] = best[i].move;
+    return count;
+}
+
+// 生成本层的两步棋并排序，返回数量。第二颗棋子的评分在第一颗落下之后重新计算，
+// 因此同一条路上相互配合的两颗棋子得分更高。
+int GeneratePairs(int player, bool is_root, PairWithScore pairs[MAX_PAIRS]) {
+    Move candidates[MAX_CANDIDATES];
+    int candidate_count = 0;
+    if (is_root) {
+        for (int i = 0; i < (int)legal_moves.size() && i < candidate_limit; i++) {
+            Move move = legal_moves[i].move;
+            if (board_state[move.x][move.y] == EMPTY_CELL) candidates[candidate_count++] = move;
+        }
+    } else {
+        candidate_count = GenerateCandidates(player, candidates);
+    }
+    int count = 0;
+    for (int i = 0; i < candidate_count; i++) {
+        Move first = candidates[i];
+        int first_score = EvaluateInitialMove(first, player) + history_scores[first.x][first.y];
+        MakeMove(first.x, first.y, player);
+        for (int j = i + 1; j < candidate_count; j++) {
+            Move second = candidates[j];
+            PairWithScore& pair = pairs[count++];
+            pair.score = first_score + EvaluateInitialMove(second, player) + history_scores[second.x][second.y];
+            pair.moves[0] = first;
+            pair.moves[1] = second;
+        }
+        UnmakeMove(first.x, first.y);
+    }
+    sort(pairs, pairs + count, [](const PairWithScore& a, const PairWithScore& b) { return a.score > b.score; });
+    return count;
+}
+
+thread_local Move iteration_moves[2]; // 本轮迭代中已完整搜索的根节点棋步里最好的一对
+thread_local bool iteration_has_moves = false; // 本轮迭代是否已有完整搜索的根节点棋步
+
 // Alpha-Beta 剪枝算法
 int AlphaBetaSearch(int alpha, int beta, int depth, int player) {
-    // 超时直接返回当前已经搜索到的最优解
-    if (IsTimeUp()) {
+    // 按节点数间隔检查时钟；中断后各层直接返回，返回值不再被使用
+    if (search_aborted) {
+        return 0;
+    }
+    if (++nodes_searched % TIME_CHECK_INTERVAL == 0 && IsTimeUp()) {
+        search_aborted = true;
         return 0;
     }
     // 达到搜索深度，返回评估值
     if (depth == 0) {
         return EvaluateBoard(player);
     }
-    // 从合法棋步中搜索
-    int num_moves = (int)legal_moves.size();
-    for (int i = 0; i < num_moves && i < 12; i++) {
-        // 模拟第一步落子
-        Move move1 = legal_moves[i].move;
-        if (board_state[move1.x][move1.y] != EMPTY_CELL) {
-            continue;
+    bool is_root = depth == root_depth;
+    int ply = root_depth - depth; // 距根节点的层数
+
+    // 查询置换表：深度足够时直接剪枝（根节点除外，需要给出棋步），否则取最佳棋步优先搜索
+    uint64_t key = PositionKey(player);
+    TTData entry;
+    bool has_hash_moves = false;
+    if (is_root && completed_depth > 0) {
+        // 根节点从上一轮迭代的最佳棋步开始
+        entry.moves[0] = optimal_moves[0];
+        entry.moves[1] = optimal_moves[1];
+        has_hash_moves = optimal_moves[1].x >= 0;
+    } else if (ProbeTransposition(key, entry)) {
+        if (!is_root && entry.depth >= depth) {
+            if (entry.bound == BOUND_EXACT ||
+                (entry.bound == BOUND_LOWER && entry.score >= beta) ||
+                (entry.bound == BOUND_UPPER && entry.score <= alpha)) {
+                tt_cutoffs++;
+                return entry.bound == BOUND_LOWER ? beta : (entry.bound == BOUND_UPPER ? alpha : entry.score);
+            }
         }
-        board_state[move1.x][move1.y] = player;
-        simulated_moves.push_back(move1);
-        for (int j = 0; j < num_moves && j < 12; j++) {
-            // 模拟第二步落子
-            Move move2 = legal_moves[j].move;
-            if (board_state[move2.x][move2.y] != EMPTY_CELL) {
-                continue;
+        has_hash_moves = entry.moves[0].x >= 0 && entry.moves[1].x >= 0 &&
+                         board_state[entry.moves[0].x][entry.moves[0].y] == EMPTY_CELL &&
+                         board_state[entry.moves[1].x][entry.moves[1].y] == EMPTY_CELL;
+    }
+
+    int original_alpha = alpha;
+    bool has_searched = false; // 是否至少搜索了一对棋步
+    Move best_moves[2] = { { -1, -1 }, { -1, -1 } };
+    // 搜索一对棋步，发生 beta 剪枝时返回 true
+    auto SearchPair = [&](Move move1, Move move2) {
+        has_searched = true;
+        MakeMove(move1.x, move1.y, player);
+        MakeMove(move2.x, move2.y, player);
+        // 评估局面
+        int score = -AlphaBetaSearch(-beta, -alpha, depth - 1, -player);
+        UnmakeMove(move2.x, move2.y);
+        UnmakeMove(move1.x, move1.y);
+        if (search_aborted) {
+            return true; // 未搜索完的分数不可信，直接退出
+        }
+        if (score >= beta) {
+            best_moves[0] = move1;
+            best_moves[1] = move2;
+            return true;
+        }
+        if (score > alpha) {
+            alpha = score;
+            best_moves[0] = move1;
+            best_moves[1] = move2;
+            if (is_root) {
+                iteration_moves[0] = move1;
+                iteration_moves[1] = move2;
+                iteration_has_moves = true;
+            }
+        }
+        return false;
+    };
+    // 剪枝：记录下界，并更新杀手棋步和历史得分
+    auto Cutoff = [&]() {
+        if (search_aborted) return 0;
+        beta_cutoffs++;
+        RecordCutoff(ply, depth, best_moves);
+        StoreTransposition(key, beta, depth, BOUND_LOWER, best_moves);
+        return beta;
+    };
+
+    // 先搜索置换表给出的最佳棋步
+    if (has_hash_moves && SearchPair(entry.moves[0], entry.moves[1])) return Cutoff();
+
+    // 再搜索本层的杀手棋步（复制一份，搜索子树时本层的记录可能被改写）
+    Move killers[KILLER_SLOTS][2];
+    memcpy(killers, killer_pairs[ply], sizeof(killers));
+    bool killer_searched[KILLER_SLOTS] = { false };
+    for (int k = 0; k < KILLER_SLOTS; k++) {
+        if (!IsPlayablePair(killers[k]) || (has_hash_moves && SamePair(killers[k], entry.moves))) continue;
+        bool duplicate = false;
+        for (int other = 0; other < k; other++) duplicate |= killer_searched[other] && SamePair(killers[k], killers[other]);
+        if (duplicate) continue;
+        killer_searched[k] = true;
+        if (SearchPair(killers[k][0], killers[k][1])) return Cutoff();
+    }
+
+    // 其余两步棋
+    PairWithScore pairs[MAX_PAIRS];
+    int pair_count = GeneratePairs(player, is_root, pairs);
+    for (int p = 0; p < pair_count; p++) {
+        const Move* pair = pairs[p].moves;
+        if (has_hash_moves && SamePair(pair, entry.moves)) continue; // 已经搜索过
+        bool searched = false;
+        for (int k = 0; k < KILLER_SLOTS; k++) searched |= killer_searched[k] && SamePair(pair, killers[k]);
+        if (searched) continue;
+        // 剪枝
+        if (SearchPair(pair[0], pair[1])) return Cutoff();
+    }
+    if (!has_searched) {
+        return EvaluateBoard(player); // 候选点已用完，按当前局面评估
+    }
+    StoreTransposition(key, alpha, depth, alpha > original_alpha ? BOUND_EXACT : BOUND_UPPER, best_moves);
+    // 返回找到的最佳分数
+    return alpha;
+}
+
+// 清空棋盘，开始新的一局
+void ResetGame() {
+    for (auto& column : board_state)
+        for (int& cell : column) cell = EMPTY_CELL;
+    memset(row_bits, 0, sizeof(row_bits));
+    for (int window = 0; window < window_count; window++)
+        window_stones[window][0] = window_stones[window][1] = 0;
+    self_line_score[0] = self_line_score[1] = 0;
+    opponent_line_score[0] = opponent_line_score[1] = 0;
+    position_hash = 0;
+    stone_count = 0;
+    side_to_move = BLACK_PIECE;
+    legal_moves.clear();
+}
+
+// 落下一手棋（一颗或两颗），同时维护棋子数
+bool ApplyMove(int x0, int y0, int x1, int y1, int piece_color) {
+    if (x0 < 0) return true; // 空手（文件输入中黑方首回合的 -1 -1 -1 -1）
+    if (x0 == x1 && y0 == y1) return false; // 两颗棋子不能落在同一点
+    if (!PlacePiece(x0, y0, x1, y1, piece_color, false)) return false;
+    stone_count += (x1 >= 0 && y1 >= 0) ? 2 : 1;
+    return true;
+}
+
+// 设置棋盘大小：重新枚举路并清空棋盘
+void SetGridSize(int size) {
+    grid_size = size;
+    InitWindows();
+    ResetGame();
+}
+
+bool report_progress = false; // 常驻模式下输出每轮迭代的信息
+void SendLine(const string& line);
+
+// 已用搜索时间（毫秒）
+long long ElapsedMs() {
+    return chrono::duration_cast<chrono::milliseconds>(chrono::high_resolution_clock::now() - search_start_time).count();
+}
+
+// 输出一轮迭代的深度、分数、节点数、速度和最佳棋步（只由主搜索线程输出）
+void ReportIteration() {
+    if (!report_progress || is_helper_thread || is_ponder_thread) return;
+    long long elapsed = ElapsedMs();
+    ostringstream info;
+    info << "info depth " << completed_depth << " score " << best_score << " nodes " << nodes_searched
+         << " nps " << nodes_searched * 1000 / max(elapsed, 1LL) << " time " << elapsed
+         << " pv " << optimal_moves[0].x << ' ' << optimal_moves[0].y << ' '
+         << optimal_moves[1].x << ' ' << optimal_moves[1].y;
+    SendLine(info.str());
+}
+
+// 迭代加深：每轮加深一个完整回合（己方、对方各一手），每轮从上一轮的最佳棋步开始搜索。
+// EvaluateBoard 不对称（己方连线分减对方连线分），深度为偶数时叶节点总是轮到己方，各轮的分数和棋步才可比较；
+// 只有棋盘将满、剩余回合数为奇数时最后一轮才是奇数深度。
+// 超时或 stop 时丢弃未完成迭代中尚未搜索完的部分，保留已完整搜索过的最佳棋步。
+// seeded_depth 非 0 时 optimal_moves 已是该深度的结果（来自后台思考），从它开始继续加深。
+void IterativeDeepening(int first_depth, int seeded_depth = 0) {
+    nodes_searched = 0;
+    beta_cutoffs = 0;
+    ClearOrdering();
+    search_aborted = false;
+    completed_depth = seeded_depth;
+    best_score = 0;
+    // 每一回合落下两颗棋子，棋盘下满后更深的迭代没有意义
+    int max_depth = max(1, min(MAX_SEARCH_DEPTH, (grid_size * grid_size - stone_count) / 2));
+    for (int depth = min(first_depth, max_depth);; depth = min(depth + 2, max_depth)) {
+        root_depth = depth;
+        iteration_has_moves = false;
+        int score = AlphaBetaSearch(-INFINITY_VALUE, INFINITY_VALUE, depth, bot_color);
+        if (iteration_has_moves) {
+            // 根节点先搜索上一轮的最佳棋步，因此中断时已搜索完的最佳棋步不比它差
+            optimal_moves[0] = iteration_moves[0];
+            optimal_moves[1] = iteration_moves[1];
+        }
+        if (search_aborted) break;
+        completed_depth = depth;
+        best_score = score;
+        ReportIteration();
+        if (depth == max_depth) break;
+    }
+}
+
+// 局面快照：用于把根局面复制到其他搜索线程
+struct PositionSnapshot {
+    int board[MAX_GRID_SIZE][MAX_GRID_SIZE];
+    uint32_t rows[2][MAX_GRID_SIZE];
+    int windows[MAX_WINDOWS][2];
+    int self_score[2];
+    int opponent_score[2];
+    uint64_t hash;
+};
+
+void SavePosition(PositionSnapshot& snapshot) {
+    memcpy(snapshot.board, board_state, sizeof(board_state));
+    memcpy(snapshot.rows, row_bits, sizeof(row_bits));
+    memcpy(snapshot.windows, window_stones, sizeof(window_stones));
+    memcpy(snapshot.self_score, self_line_score, sizeof(self_line_score));
+    memcpy(snapshot.opponent_score, opponent_line_score, sizeof(opponent_line_score));
+    snapshot.hash = position_hash;
+}
+
+void RestorePosition(const PositionSnapshot& snapshot) {
+    memcpy(board_state, snapshot.board, sizeof(board_state));
+    memcpy(row_bits, snapshot.rows, sizeof(row_bits));
+    memcpy(window_stones, snapshot.windows, sizeof(window_stones));
+    memcpy(self_line_score, snapshot.self_score, sizeof(self_line_score));
+    memcpy(opponent_line_score, snapshot.opponent_score, sizeof(opponent_line_score));
+    position_hash = snapshot.hash;
+}
+
+// 所有搜索线程的统计汇总
+struct SearchTotals {
+    long long nodes;
+    long long cutoffs; // beta 剪枝次数
+    long long timeouts; // 因超时或 stop 中断了迭代的线程数
+    long long tt_probes;
+    long long tt_hits;
+    long long tt_cutoffs;
+    long long tt_stores;
+    long long tt_overwrites;
+};
+SearchTotals search_totals{};
+mutex totals_mutex;
+
+// 将当前线程的计数累加到汇总中
+void CollectStats() {
+    lock_guard<mutex> lock(totals_mutex);
+    search_totals.nodes += nodes_searched;
+    search_totals.cutoffs += beta_cutoffs;
+    search_totals.timeouts += search_aborted ? 1 : 0;
+    search_totals.tt_probes += tt_probes;
+    search_totals.tt_hits += tt_hits;
+    search_totals.tt_cutoffs += tt_cutoffs;
+    search_totals.tt_stores += tt_stores;
+    search_totals.tt_overwrites += tt_overwrites;
+}
+
+// 一个搜索线程的结果
+struct ThreadResult {
+    int depth;
+    int score;
+    Move moves[2];
+};
+
+// 辅助搜索线程：在根局面副本上独立迭代加深，奇数号线程晚一个回合开始以错开搜索进度
+void HelperSearch(const PositionSnapshot* root, const vector<MoveWithScore>* root_moves, int first_depth, int index,
+                  ThreadResult* result) {
+    is_helper_thread = true;
+    RestorePosition(*root);
+    legal_moves = *root_moves;
+    optimal_moves[0] = legal_moves[0].move;
+    optimal_moves[1] = legal_moves[1].move;
+    ResetTTStats();
+    IterativeDeepening(first_depth + 2 * (index % 2));
+    CollectStats();
+    *result = ThreadResult{ completed_depth, best_score, { optimal_moves[0], optimal_moves[1] } };
+}
+
+// 多线程搜索：主线程按时间预算搜索，结束后通知辅助线程停止，采用完成深度最大的线程的结果。
+// seeded_depth 非 0 时 optimal_moves 是已搜索到该深度的结果，各线程从更深一个回合开始
+void ParallelSearch(int seeded_depth = 0) {
+    int helper_count = max(search_threads, 1) - 1;
+    unique_ptr<PositionSnapshot> root(new PositionSnapshot);
+    SavePosition(*root);
+    vector<MoveWithScore> root_moves = legal_moves;
+    vector<ThreadResult> results(helper_count);
+    vector<thread> helpers;
+    helpers_stop = false;
+    for (int i = 0; i < helper_count; i++) {
+        helpers.emplace_back(HelperSearch, root.get(), &root_moves, seeded_depth + 2, i + 1, &results[i]);
+    }
+    ResetTTStats();
+    IterativeDeepening(seeded_depth + 2, seeded_depth);
+    helpers_stop = true;
+    for (thread& helper : helpers) helper.join();
+    CollectStats();
+    for (const ThreadResult& result : results) {
+        if (result.depth > completed_depth) {
+            completed_depth = result.depth;
+            best_score = result.score;
+            optimal_moves[0] = result.moves[0];
+            optimal_moves[1] = result.moves[1];
+        }
+    }
+}
+
+// ---------------- 威胁空间搜索 ----------------
+// 一条路上有一方的四颗或五颗棋子、没有对方棋子，即为该方的一个“威胁”：轮到该方时用两颗棋子就能连成六子。
+// 威胁数为对方挡住全部威胁所需的最少棋子数（按 3 封顶）：轮到己方时有威胁即胜；
+// 走完一手后威胁数不少于 3，对方两颗棋子挡不住，也必胜。
+// 威胁空间搜索只考虑制造双威胁的棋步与挡住威胁的应手（连续双威胁），在正式搜索之前以独立的节点预算
+// 证明必胜，或找出唯一的防守，战术局面因此无需花满整个时间预算。
+#define TSS_MAX_DEPTH 5 // 连续双威胁的最大回合数
+#define TSS_NONE 0
+#define TSS_WIN 1 // 找到必胜
+#define TSS_DEFEND 2 // 对方已有威胁，只有一种挡法
+long long tss_node_limit = 20000; // 威胁空间搜索的节点预算，0 为不搜索
+thread_local long long tss_nodes = 0;
+
+// 点是否在路上
+inline bool WindowContains(int window, Move cell) {
+    for (const Move& c : window_cells[window]) {
+        if (c.x == cell.x && c.y == cell.y) return true;
+    }
+    return false;
+}
+
+// 一条路上的空点，返回个数
+int WindowEmpties(int window, Move empties[WINDOW_LENGTH]) {
+    int count = 0;
+    for (const Move& c : window_cells[window]) {
+        if (board_state[c.x][c.y] == EMPTY_CELL) empties[count++] = c;
+    }
+    return count;
+}
+
+// 收集 player 的威胁路，返回威胁数（挡住全部威胁所需的最少棋子数，按 3 封顶）
+int CountThreats(int player, vector<int>& threats) {
+    int color = ColorIndex(player), other = 1 - color;
+    threats.clear();
+    for (int window = 0; window < window_count; window++) {
+        if (window_stones[window][color] >= WINDOW_LENGTH - 2 && window_stones[window][other] == 0)
+            threats.push_back(window);
+    }
+    if (threats.empty()) return 0;
+    // 能挡住全部威胁的棋子必有一颗落在第一条威胁路的空点上
+    Move first[WINDOW_LENGTH];
+    int first_count = WindowEmpties(threats[0], first);
+    int result = 3;
+    for (int i = 0; i < first_count && result > 1; i++) {
+        int rest = -1; // 第一条没被 first[i] 挡住的威胁路
+        bool single = true;
+        for (int window : threats) {
+            if (WindowContains(window, first[i])) continue;
+            single = false;
+            rest = window;
+            break;
+        }
+        if (single) return 1;
+        Move second[WINDOW_LENGTH];
+        int second_count = WindowEmpties(rest, second);
+        for (int j = 0; j < second_count && result > 2; j++) {
+            bool blocked = true;
+            for (int window : threats) {
+                if (!WindowContains(window, first[i]) && !WindowContains(window, second[j])) {
+                    blocked = false;
+                    break;
+                }
             }
-            board_state[move2.x][move2.y] = player;
-            simulated_moves.push_back(move2);
-            // 评估局面
-            int score = -AlphaBetaSearch(-beta, -alpha, depth - 1, -player);
-            // 撤回第二步落子
-            board_state[move2.x][move2.y] = 0;
-            simulated_moves.pop_back();
-            // 剪枝
-            if (score >= beta) {
-                // 撤回第一步落子
-                board_state[move1.x][move1.y] = 0;
-                simulated_moves.pop_back();
-                return beta;
+            if (blocked) result = 2;
+        }
+    }
+    return result;
+}
+
+// 列出用两颗棋子挡住全部威胁（威胁数为 2）的所有挡法
+void BlockingPairs(const vector<int>& threats, vector<pair<Move, Move>>& blocks) {
+    blocks.clear();
+    Move first[WINDOW_LENGTH];
+    int first_count = WindowEmpties(threats[0], first);
+    for (int i = 0; i < first_count; i++) {
+        int rest = -1;
+        for (int window : threats) {
+            if (!WindowContains(window, first[i])) {
+                rest = window;
+                break;
             }
-            if (score > alpha) {
-                alpha = score;
-                if (depth == 2) {
-                    optimal_moves[0] = move1;
-                    optimal_moves[1] = move2;
+        }
+        if (rest < 0) continue;
+        Move second[WINDOW_LENGTH];
+        int second_count = WindowEmpties(rest, second);
+        for (int j = 0; j < second_count; j++) {
+            bool blocked = true;
+            for (int window : threats) {
+                if (!WindowContains(window, first[i]) && !WindowContains(window, second[j])) {
+                    blocked = false;
+                    break;
                 }
             }
+            if (!blocked) continue;
+            // 两颗都在第一条威胁路上时，同一挡法会被枚举两次
+            bool duplicate = false;
+            for (const auto& block : blocks) {
+                if (block.first.x == second[j].x && block.first.y == second[j].y &&
+                    block.second.x == first[i].x && block.second.y == first[i].y) duplicate = true;
+            }
+            if (!duplicate) blocks.push_back({ first[i], second[j] });
         }
-        // 撤回第一步落子
-        board_state[move1.x][move1.y] = 0;
-        simulated_moves.pop_back();
     }
-    // 返回找到的最佳分数
-    return alpha;
 }
 
-int main() {
+// 连续双威胁：attacker 每手都制造双威胁（或三个以上威胁），对方的每种挡法之后仍能继续，直到挡不住为止
+bool ThreatSpaceSearch(int attacker, int depth, Move win[2]) {
+    int color = ColorIndex(attacker), other = 1 - color;
+    // 候选点：己方至少两颗、对方没有棋子的路上的空点
+    static thread_local int seen[MAX_GRID_SIZE][MAX_GRID_SIZE];
+    static thread_local int stamp = 0;
+    stamp++;
+    vector<Move> cells;
+    for (int window = 0; window < window_count; window++) {
+        if (window_stones[window][color] < WINDOW_LENGTH - 4 || window_stones[window][other] != 0) continue;
+        for (const Move& c : window_cells[window]) {
+            if (board_state[c.x][c.y] != EMPTY_CELL || seen[c.x][c.y] == stamp) continue;
+            seen[c.x][c.y] = stamp;
+            cells.push_back(c);
+        }
+    }
+    // 找出所有制造双威胁的两步棋，能造成三个以上威胁的直接获胜
+    vector<pair<Move, Move>> attacks;
+    vector<int> threats;
+    for (size_t i = 0; i < cells.size(); i++) {
+        for (size_t j = i + 1; j < cells.size(); j++) {
+            if (++tss_nodes > tss_node_limit) return false;
+            MakeMove(cells[i].x, cells[i].y, attacker);
+            MakeMove(cells[j].x, cells[j].y, attacker);
+            int count = CountThreats(attacker, threats);
+            UnmakeMove(cells[j].x, cells[j].y);
+            UnmakeMove(cells[i].x, cells[i].y);
+            if (count >= 3) {
+                win[0] = cells[i];
+                win[1] = cells[j];
+                return true;
+            }
+            if (count == 2) attacks.push_back({ cells[i], cells[j] });
+        }
+    }
+    if (depth <= 1) return false;
+    // 对方必须用两颗棋子挡住；挡完后若对方反而有了威胁，这条线不再是连续双威胁，视为失败
+    vector<pair<Move, Move>> blocks;
+    Move next[2];
+    for (const auto& attack : attacks) {
+        MakeMove(attack.first.x, attack.first.y, attacker);
+        MakeMove(attack.second.x, attack.second.y, attacker);
+        CountThreats(attacker, threats);
+        BlockingPairs(threats, blocks);
+        bool proven = !blocks.empty();
+        for (const auto& block : blocks) {
+            MakeMove(block.first.x, block.first.y, -attacker);
+            MakeMove(block.second.x, block.second.y, -attacker);
+            proven = CountThreats(-attacker, threats) == 0 && ThreatSpaceSearch(attacker, depth - 1, next);
+            UnmakeMove(block.second.x, block.second.y);
+            UnmakeMove(block.first.x, block.first.y);
+            if (!proven) break;
+        }
+        UnmakeMove(attack.second.x, attack.second.y);
+        UnmakeMove(attack.first.x, attack.first.y);
+        if (proven) {
+            win[0] = attack.first;
+            win[1] = attack.second;
+            return true;
+        }
+        if (tss_nodes > tss_node_limit) return false;
+    }
+    return false;
+}
+
+// 正式搜索前的战术检查：立即获胜、唯一的防守或连续双威胁的必胜，结果写入 moves
+int TacticalSearch(int player, Move moves[2]) {
+    tss_nodes = 0;
+    if (tss_node_limit <= 0) return TSS_NONE;
+    vector<int> threats;
+    // 己方已有威胁：补齐该路即连成六子
+    if (CountThreats(player, threats) > 0) {
+        Move empties[WINDOW_LENGTH];
+        int best = threats[0];
+        for (int window : threats) {
+            if (window_stones[window][ColorIndex(player)] > window_stones[best][ColorIndex(player)]) best = window;
+        }
+        int count = WindowEmpties(best, empties);
+        moves[0] = empties[0];
+        moves[1] = count > 1 ? empties[1] : Move{ -1, -1 };
+        for (size_t i = 0; moves[1].x < 0 && i < legal_moves.size(); i++) {
+            if (legal_moves[i].move.x != moves[0].x || legal_moves[i].move.y != moves[0].y) moves[1] = legal_moves[i].move;
+        }
+        return TSS_WIN;
+    }
+    // 对方已有威胁：挡法唯一时直接给出，否则交给正式搜索
+    int opponent_threats = CountThreats(-player, threats);
+    if (opponent_threats > 0) {
+        if (opponent_threats != 2) return TSS_NONE;
+        vector<pair<Move, Move>> blocks;
+        BlockingPairs(threats, blocks);
+        if (blocks.size() != 1) return TSS_NONE;
+        moves[0] = blocks[0].first;
+        moves[1] = blocks[0].second;
+        return TSS_DEFEND;
+    }
+    return ThreatSpaceSearch(player, TSS_MAX_DEPTH, moves) ? TSS_WIN : TSS_NONE;
+}
+
+// ---------------- 残局精确求解 ----------------
+// 空点不多于 endgame_empty_limit 时，正式搜索之前对空点的所有两两组合做全宽度的 Alpha-Beta 搜索，
+// 结果只有胜、和、负三种，按局面哈希记入备忘表，同一局面不同的落子顺序只求解一次。
+// 以下两种裁剪不影响结果：经过的路都已同时有黑白棋子的空点（死点）对胜负没有影响、相互等价，
+// 每步最多取其中两个；双方都没有能连成六子的路时直接判和。
+#define SOLVE_LOSS (-1)
+#define SOLVE_DRAW 0
+#define SOLVE_WIN 1
+#define SOLVE_UNKNOWN 2 // 超出节点预算或时间，未能证明
+#define ENDGAME_MAX_EMPTIES 40 // 可设置的空点数上限
+#define SOLVER_TABLE_SIZE (1 << 18) // 备忘表的项数
+int endgame_empty_limit = 24; // 空点不多于此数时精确求解，0 为关闭
+long long endgame_node_limit = 2000000; // 每次求解的节点预算
+thread_local long long endgame_nodes = 0;
+thread_local bool endgame_aborted = false;
+
+// 备忘表项：结果及其类型（精确值或上下界）和最佳两步棋
+struct SolverEntry {
+    uint64_t key;
+    int8_t value;
+    int8_t bound;
+    Move moves[2];
+};
+vector<SolverEntry> solver_table; // 首次求解时分配
+
+// 清空备忘表（改变棋盘大小时，相同哈希的局面结果不同）
+void ClearSolverTable() {
+    fill(solver_table.begin(), solver_table.end(), SolverEntry{});
+}
+
+// 求解的时间上限为本次预算的一半，未能证明时留出时间给正式搜索；按节点数搜索时只受节点预算限制
+bool EndgameTimeUp() {
+    if (stop_requested.load(memory_order_relaxed)) return true;
+    if (node_limit > 0) return false;
+    return ElapsedMs() * 2 >= search_time_ms;
+}
+
+// 求解 player 落子、还有 empties 个空点的局面，返回 player 视角的结果，最佳两步棋写入 best
+int SolveEndgame(int alpha, int beta, int player, int empties, Move best[2]) {
+    if (endgame_aborted) return SOLVE_DRAW;
+    if (++endgame_nodes > endgame_node_limit || (endgame_nodes % TIME_CHECK_INTERVAL == 0 && EndgameTimeUp())) {
+        endgame_aborted = true;
+        return SOLVE_DRAW;
+    }
+    if (empties == 0) return SOLVE_DRAW;
+    int color = ColorIndex(player), other = 1 - color;
+    int stones = min(empties, 2); // 本手落子数
+    // 一手就能连成六子；同时标出活点（至少经过一条只有一方棋子的路）
+    static thread_local int live[MAX_GRID_SIZE][MAX_GRID_SIZE];
+    static thread_local int stamp = 0;
+    int node_stamp = ++stamp;
+    bool any_live = false;
+    for (int window = 0; window < window_count; window++) {
+        int own = window_stones[window][color], opponent = window_stones[window][other];
+        if (own != 0 && opponent != 0) continue;
+        any_live = true;
+        if (opponent == 0 && own >= WINDOW_LENGTH - stones) {
+            Move cells[WINDOW_LENGTH];
+            int count = WindowEmpties(window, cells);
+            best[0] = cells[0];
+            best[1] = count > 1 ? cells[1] : Move{ -1, -1 };
+            // 只差一颗时第二颗落在任意空点
+            for (int i = 0; best[1].x < 0 && stones == 2 && i < grid_size * grid_size; i++) {
+                Move cell{ i % grid_size, i / grid_size };
+                if (board_state[cell.x][cell.y] == EMPTY_CELL && (cell.x != best[0].x || cell.y != best[0].y)) best[1] = cell;
+            }
+            return SOLVE_WIN;
+        }
+        for (const Move& c : window_cells[window]) live[c.x][c.y] = node_stamp;
+    }
+    if (!any_live) return SOLVE_DRAW;
+
+    // 查询备忘表
+    uint64_t key = PositionKey(player);
+    SolverEntry& entry = solver_table[key & (SOLVER_TABLE_SIZE - 1)];
+    Move hash_moves[2] = { { -1, -1 }, { -1, -1 } };
+    if (entry.key == key) {
+        if (entry.bound == BOUND_EXACT || (entry.bound == BOUND_LOWER && entry.value >= beta) ||
+            (entry.bound == BOUND_UPPER && entry.value <= alpha)) {
+            best[0] = entry.moves[0];
+            best[1] = entry.moves[1];
+            return entry.value;
+        }
+        hash_moves[0] = entry.moves[0];
+        hash_moves[1] = entry.moves[1];
+    }
+
+    // 候选点：全部活点按初始评分排序，之后最多两个死点
+    MoveWithScore cells[ENDGAME_MAX_EMPTIES];
+    int live_count = 0, dead_count = 0;
+    Move dead[2];
+    for (int y = 0; y < grid_size; y++) {
+        for (int x = 0; x < grid_size; x++) {
+            if (board_state[x][y] != EMPTY_CELL) continue;
+            if (live[x][y] == node_stamp) cells[live_count++] = MoveWithScore{ EvaluateInitialMove(Move{ x, y }, player), Move{ x, y } };
+            else if (dead_count < stones) dead[dead_count++] = Move{ x, y };
+        }
+    }
+    sort(cells, cells + live_count, CompareMoves);
+    int cell_count = live_count;
+    for (int i = 0; i < dead_count; i++) cells[cell_count++] = MoveWithScore{ 0, dead[i] };
+
+    // 两两组合（只剩一个空点时落一颗），备忘表给出的棋步优先
+    PairWithScore pairs[ENDGAME_MAX_EMPTIES * (ENDGAME_MAX_EMPTIES - 1) / 2 + ENDGAME_MAX_EMPTIES];
+    int pair_count = 0;
+    for (int i = 0; i < cell_count; i++) {
+        if (stones == 1) {
+            pairs[pair_count++] = PairWithScore{ cells[i].score, { cells[i].move, Move{ -1, -1 } } };
+            continue;
+        }
+        for (int j = i + 1; j < cell_count; j++)
+            pairs[pair_count++] = PairWithScore{ cells[i].score + cells[j].score, { cells[i].move, cells[j].move } };
+    }
+    for (int p = 0; p < pair_count; p++) {
+        if (SamePair(pairs[p].moves, hash_moves)) pairs[p].score = INFINITY_VALUE;
+    }
+    stable_sort(pairs, pairs + pair_count, [](const PairWithScore& a, const PairWithScore& b) { return a.score > b.score; });
+
+    int original_alpha = alpha;
+    int best_value = SOLVE_LOSS - 1;
+    Move child[2];
+    for (int p = 0; p < pair_count && alpha < beta; p++) {
+        const Move* pair = pairs[p].moves;
+        for (int k = 0; k < stones; k++) MakeMove(pair[k].x, pair[k].y, player);
+        int value = -SolveEndgame(-beta, -alpha, -player, empties - stones, child);
+        for (int k = stones - 1; k >= 0; k--) UnmakeMove(pair[k].x, pair[k].y);
+        if (endgame_aborted) return SOLVE_DRAW;
+        if (value > best_value) {
+            best_value = value;
+            best[0] = pair[0];
+            best[1] = pair[1];
+            alpha = max(alpha, value);
+        }
+    }
+    entry.key = key;
+    entry.value = (int8_t)best_value;
+    entry.bound = best_value <= original_alpha ? BOUND_UPPER : (best_value >= beta ? BOUND_LOWER : BOUND_EXACT);
+    entry.moves[0] = best[0];
+    entry.moves[1] = best[1];
+    return best_value;
+}
+
+// 空点不多于阈值时精确求解 player 落子的局面，返回结果（SOLVE_UNKNOWN 为没有求解或未能证明），
+// 证明胜或和时最佳两步棋写入 moves
+int EndgameSearch(int player, Move moves[2]) {
+    endgame_nodes = 0;
+    int empties = grid_size * grid_size - stone_count;
+    if (endgame_empty_limit <= 0 || empties > endgame_empty_limit) return SOLVE_UNKNOWN;
+    if (solver_table.empty()) solver_table.resize(SOLVER_TABLE_SIZE);
+    endgame_aborted = false;
+    Move best[2] = { { -1, -1 }, { -1, -1 } };
+    int result = SolveEndgame(SOLVE_LOSS, SOLVE_WIN, player, empties, best);
+    if (endgame_aborted) return SOLVE_UNKNOWN;
+    if (result != SOLVE_LOSS && best[0].x >= 0) {
+        moves[0] = best[0];
+        moves[1] = best[1];
+    }
+    return result;
+}
+
+// ---------------- 局面库（开局库） ----------------
+// 持久化的局面缓存：键为局面在 8 种棋盘对称变换下的最小哈希（含轮到哪方），
+// 值为该局面搜索得到的最佳两步棋（以对应的标准朝向存储）和搜索深度。
+// 库文件以内存映射方式打开，大小在创建时固定，按桶组织；桶满时淘汰深度最浅、最久未用的表项。
+// 搜索前先查询局面库，命中则直接给出棋步；每次搜索完成后把结果写回（只会被更深的结果覆盖）。
+#define BOOK_MAGIC 0x314B4F4F42364E43ULL // "CN6BOOK1"
+#define BOOK_VERSION 1
+#define DEFAULT_BOOK_MB 16 // 新建局面库的默认大小
+
+struct BookHeader {
+    uint64_t magic;
+    uint32_t version;
+    uint32_t grid_size;
+    uint64_t bucket_count;
+    uint64_t clock; // 访问计数，用于判断表项的新旧
+};
+
+struct BookEntry {
+    uint64_t key; // 标准键 ^ data
+    uint64_t data; // 两步棋(4x5) | 深度(8) | 最近访问时间(32)
+};
+
+struct BookBucket {
+    BookEntry entries[BUCKET_SIZE];
+};
+
+BookHeader* book_header = nullptr; // 映射后的文件头，为空表示未启用局面库
+BookBucket* book_buckets = nullptr;
+size_t book_bytes = 0;
+#define DEFAULT_BOOK_MIN_DEPTH 5 // 浅层结果若写入库中，会在之后的对局里直接给出而挡住更深的搜索
+int book_min_depth = DEFAULT_BOOK_MIN_DEPTH; // 只写入、只采用不浅于此深度的结果
+#ifdef _WIN32
+HANDLE book_file = INVALID_HANDLE_VALUE;
+HANDLE book_mapping = nullptr;
+#else
+int book_file = -1;
+#endif
+
+void CloseBook() {
+    if (book_header == nullptr) return;
+#ifdef _WIN32
+    UnmapViewOfFile(book_header);
+    CloseHandle(book_mapping);
+    CloseHandle(book_file);
+    book_mapping = nullptr;
+    book_file = INVALID_HANDLE_VALUE;
+#else
+    munmap(book_header, book_bytes);
+    close(book_file);
+    book_file = -1;
+#endif
+    book_header = nullptr;
+    book_buckets = nullptr;
+    book_bytes = 0;
+}
+
+// 打开（不存在则按 size_mb 创建）局面库文件并映射到内存
+bool OpenBook(const string& path, int size_mb) {
+    CloseBook();
+    uint64_t buckets = 1;
+    uint64_t limit = max<uint64_t>((uint64_t)size_mb * 1024 * 1024 / sizeof(BookBucket), 1);
+    while (buckets * 2 <= limit) buckets *= 2;
+    size_t new_bytes = sizeof(BookHeader) + buckets * sizeof(BookBucket);
+    size_t file_bytes = 0;
+    void* view = nullptr;
+#ifdef _WIN32
+    book_file = CreateFileA(path.c_str(), GENERIC_READ | GENERIC_WRITE, FILE_SHARE_READ | FILE_SHARE_WRITE,
+                            nullptr, OPEN_ALWAYS, FILE_ATTRIBUTE_NORMAL, nullptr);
+    if (book_file == INVALID_HANDLE_VALUE) return false;
+    LARGE_INTEGER size;
+    GetFileSizeEx(book_file, &size);
+    file_bytes = size.QuadPart ? (size_t)size.QuadPart : new_bytes;
+    LARGE_INTEGER mapping_size;
+    mapping_size.QuadPart = (LONGLONG)file_bytes;
+    book_mapping = CreateFileMappingA(book_file, nullptr, PAGE_READWRITE, mapping_size.HighPart,
+                                      mapping_size.LowPart, nullptr);
+    if (book_mapping != nullptr) view = MapViewOfFile(book_mapping, FILE_MAP_ALL_ACCESS, 0, 0, file_bytes);
+    if (view == nullptr) {
+        if (book_mapping != nullptr) CloseHandle(book_mapping);
+        CloseHandle(book_file);
+        book_mapping = nullptr;
+        book_file = INVALID_HANDLE_VALUE;
+        return false;
+    }
+#else
+    book_file = open(path.c_str(), O_RDWR | O_CREAT, 0644);
+    if (book_file < 0) return false;
+    struct stat info;
+    fstat(book_file, &info);
+    file_bytes = info.st_size ? (size_t)info.st_size : new_bytes;
+    if (info.st_size == 0 && ftruncate(book_file, (off_t)file_bytes) != 0) {
+        close(book_file);
+        book_file = -1;
+        return false;
+    }
+    view = mmap(nullptr, file_bytes, PROT_READ | PROT_WRITE, MAP_SHARED, book_file, 0);
+    if (view == MAP_FAILED) {
+        close(book_file);
+        book_file = -1;
+        return false;
+    }
+#endif
+    book_header = (BookHeader*)view;
+    book_bytes = file_bytes;
+    book_buckets = (BookBucket*)(book_header + 1);
+    if (book_header->magic == 0) { // 新文件
+        book_header->magic = BOOK_MAGIC;
+        book_header->version = BOOK_VERSION;
+        book_header->grid_size = grid_size;
+        book_header->bucket_count = buckets;
+        book_header->clock = 0;
+    }
+    uint64_t count = book_header->bucket_count;
+    if (book_header->magic != BOOK_MAGIC || book_header->version != BOOK_VERSION ||
+        book_header->grid_size != (uint32_t)grid_size || count == 0 || (count & (count - 1)) != 0 ||
+        sizeof(BookHeader) + count * sizeof(BookBucket) > file_bytes) {
+        CloseBook(); // 不是本程序的局面库，或棋盘大小不同
+        return false;
+    }
+    return true;
+}
+
+// 对称变换：sym 的低两位为逆时针旋转 90 度的次数，第 3 位表示先左右翻转
+inline Move TransformMove(int sym, Move move) {
+    if (move.x < 0) return move;
+    int x = move.x, y = move.y;
+    if (sym & 4) x = grid_size - 1 - x;
+    for (int r = 0; r < (sym & 3); r++) {
+        int t = x;
+        x = y;
+        y = grid_size - 1 - t;
+    }
+    return Move{ x, y };
+}
+
+// 逆变换
+inline Move InverseTransformMove(int sym, Move move) {
+    if (move.x < 0) return move;
+    int x = move.x, y = move.y;
+    for (int r = 0; r < (sym & 3); r++) {
+        int t = y;
+        y = x;
+        x = grid_size - 1 - t;
+    }
+    if (sym & 4) x = grid_size - 1 - x;
+    return Move{ x, y };
+}
+
+// 计算当前局面的标准键及对应的对称变换
+uint64_t CanonicalKey(int player, int& symmetry) {
+    uint64_t keys[8] = { 0 };
+    for (int x = 0; x < grid_size; x++) {
+        for (int y = 0; y < grid_size; y++) {
+            if (board_state[x][y] == EMPTY_CELL) continue;
+            int color = ColorIndex(board_state[x][y]);
+            for (int sym = 0; sym < 8; sym++) {
+                Move cell = TransformMove(sym, Move{ x, y });
+                keys[sym] ^= zobrist_keys[cell.x][cell.y][color];
+            }
+        }
+    }
+    symmetry = 0;
+    for (int sym = 1; sym < 8; sym++) {
+        if (keys[sym] < keys[symmetry]) symmetry = sym;
+    }
+    uint64_t key = keys[symmetry] ^ (player == WHITE_PIECE ? zobrist_side_key : 0);
+    return key ? key : 1;
+}
+
+// 查询局面库，命中且棋步合法时写入 moves 并返回库中结果的深度，否则返回 0
+int ProbeBook(int player, Move moves[2]) {
+    if (book_header == nullptr) return 0;
+    int symmetry;
+    uint64_t key = CanonicalKey(player, symmetry);
+    BookBucket& bucket = book_buckets[key & (book_header->bucket_count - 1)];
+    for (BookEntry& entry : bucket.entries) {
+        uint64_t data = entry.data;
+        if ((entry.key ^ data) != key) continue;
+        int depth = (int)((data >> 20) & 0xFF);
+        if (depth < book_min_depth) return 0;
+        Move found[2];
+        for (int k = 0; k < 2; k++) {
+            Move stored{ UnpackCoordinate((data >> (k * 10)) & 31), UnpackCoordinate((data >> (k * 10 + 5)) & 31) };
+            found[k] = InverseTransformMove(symmetry, stored);
+            if (!IsWithinBoard(found[k].x, found[k].y) || board_state[found[k].x][found[k].y] != EMPTY_CELL)
+                return 0;
+        }
+        // 刷新访问时间
+        uint64_t refreshed = (data & 0xFFFFFFFFULL) | ((++book_header->clock & 0xFFFFFFFFULL) << 32);
+        entry.key = key ^ refreshed;
+        entry.data = refreshed;
+        moves[0] = found[0];
+        moves[1] = found[1];
+        return depth;
+    }
+    return 0;
+}
+
+// 将搜索结果写入局面库：同一局面只被更深的结果覆盖；桶满时淘汰深度最浅、最久未用的表项
+void StoreBook(int player, int depth, const Move moves[2]) {
+    if (book_header == nullptr || depth < book_min_depth || moves[0].x < 0 || moves[1].x < 0) return;
+    int symmetry;
+    uint64_t key = CanonicalKey(player, symmetry);
+    BookBucket& bucket = book_buckets[key & (book_header->bucket_count - 1)];
+    BookEntry* target = nullptr;
+    uint64_t worst_value = numeric_limits<uint64_t>::max();
+    for (BookEntry& entry : bucket.entries) {
+        uint64_t data = entry.data;
+        uint64_t value = ((data >> 20) & 0xFF) << 32 | (data >> 32); // 深度优先，其次访问时间
+        if ((entry.key ^ data) == key) {
+            if ((int)((data >> 20) & 0xFF) > depth) return;
+            target = &entry;
+            break;
+        }
+        if (entry.key == 0) value = 0;
+        if (value < worst_value) {
+            worst_value = value;
+            target = &entry;
+        }
+    }
+    uint64_t data = 0;
+    for (int k = 0; k < 2; k++) {
+        Move stored = TransformMove(symmetry, moves[k]);
+        data |= PackCoordinate(stored.x) << (k * 10);
+        data |= PackCoordinate(stored.y) << (k * 10 + 5);
+    }
+    data |= (uint64_t)(min(depth, 255)) << 20;
+    data |= (++book_header->clock & 0xFFFFFFFFULL) << 32;
+    target->key = key ^ data;
+    target->data = data;
+}
+
+// ---------------- 后台思考（ponder） ----------------
+// 己方落子后、对方思考期间，按 GenerateLegalMoves 的排序预测对方最可能的若干应手，
+// 在每个应手之后为己方搜索并记下结果。对方实际落子与某个预测相同、且结果不浅于本次预算能搜到的深度时直接采用，
+// 较浅时从该结果开始继续加深；未命中时丢弃这些结果，正常搜索（置换表中已搜索过的共同子树仍可复用）。
+#define PONDER_CANDIDATES 6 // 从对方评分最高的这么多个点中两两组合出预测应手
+#define PONDER_REPLIES 8 // 最多预测的应手数
+#define PONDER_SLICE_MS 100 // 第一轮每个应手的搜索时间，此后每轮翻倍
+
+struct PonderResult {
+    Move reply[2]; // 预测的对方应手
+    int score; // 应手的初始评分，用于排序
+    uint64_t key; // 应手之后的局面键（轮到己方）
+    int depth; // 己方应对的完成深度，0 表示尚未搜索
+    Move moves[2]; // 己方的最佳两步棋
+};
+vector<PonderResult> ponder_results; // 最近一次后台思考的结果
+
+// 当前局面是否命中后台思考的结果，命中则写入 moves 并返回完成深度，否则返回 0
+int ProbePonder(int player, Move moves[2]) {
+    uint64_t key = PositionKey(player);
+    for (const PonderResult& result : ponder_results) {
+        if (result.key != key || result.depth == 0) continue;
+        for (int k = 0; k < 2; k++) {
+            if (board_state[result.moves[k].x][result.moves[k].y] != EMPTY_CELL) return 0;
+        }
+        moves[0] = result.moves[0];
+        moves[1] = result.moves[1];
+        return result.depth;
+    }
+    return 0;
+}
+
+// 最近一次正式搜索（未借用后台思考结果）的完成深度和预算，用于估计本次预算能搜到的深度
+int last_search_depth = 0;
+int last_search_time_ms = 0;
+long long last_node_limit = 0;
+
+// 本次预算预计能达到的深度；预算比上次大或计数方式不同时无法估计，返回 MAX_SEARCH_DEPTH
+int ExpectedSearchDepth() {
+    if (last_search_depth == 0 || node_limit != last_node_limit) return MAX_SEARCH_DEPTH;
+    if (node_limit == 0 && search_time_ms > last_search_time_ms) return MAX_SEARCH_DEPTH;
+    return last_search_depth;
+}
+
+// 为 bot_color 决策本回合的两步棋，结果写入 optimal_moves
+void Think() {
+    search_totals = SearchTotals{};
+    // 空棋盘：黑方第一手只下天元
+    if (stone_count == 0) {
+        optimal_moves[0].x = (grid_size - 1) / 2;
+        optimal_moves[0].y = (grid_size - 1) / 2;
+        optimal_moves[1].x = -1;
+        optimal_moves[1].y = -1;
+        return;
+    }
+    // 扩展边界，并生成所有合法棋步（白方第一回合只扩展一格）
+    GenerateLegalMoves(bot_color, stone_count == 1 ? 1 : 2);
+    if (legal_moves.size() < 2) { // 棋盘将满，无法再下两步
+        optimal_moves[0] = legal_moves.empty() ? Move{ -1, -1 } : legal_moves[0].move;
+        optimal_moves[1] = Move{ -1, -1 };
+        return;
+    }
+
+    // 决策
+    optimal_moves[0] = legal_moves[0].move;
+    optimal_moves[1] = legal_moves[1].move;
+    if (stone_count != 1) {
+        // 先做战术检查，能直接取胜或只有一种挡法时不再搜索
+        int tactic = TacticalSearch(bot_color, optimal_moves);
+        if (tactic != TSS_NONE) {
+            completed_depth = 0;
+            if (report_progress) {
+                ostringstream info;
+                info << "info tss result " << tactic << " nodes " << tss_nodes
+                     << " time " << ElapsedMs() << " pv " << optimal_moves[0].x << ' ' << optimal_moves[0].y
+                     << ' ' << optimal_moves[1].x << ' ' << optimal_moves[1].y;
+                SendLine(info.str());
+            }
+            return;
+        }
+        // 空点不多时精确求解，证明胜或和时直接给出；必败时仍交给正式搜索，争取对方失误
+        int endgame = EndgameSearch(bot_color, optimal_moves);
+        if (endgame_nodes > 0 && report_progress) {
+            ostringstream info;
+            info << "info endgame result " << endgame << " nodes " << endgame_nodes << " time " << ElapsedMs();
+            if (endgame == SOLVE_WIN || endgame == SOLVE_DRAW) {
+                info << " pv " << optimal_moves[0].x << ' ' << optimal_moves[0].y
+                     << ' ' << optimal_moves[1].x << ' ' << optimal_moves[1].y;
+            }
+            SendLine(info.str());
+        }
+        if (endgame == SOLVE_WIN || endgame == SOLVE_DRAW) {
+            completed_depth = 0;
+            return;
+        }
+        // 对方的应手已在后台思考中搜索过：不浅于本次预算能搜到的深度时直接采用
+        Move ponder_moves[2];
+        int ponder_depth = ProbePonder(bot_color, ponder_moves);
+        if (ponder_depth > 0 && ponder_depth >= ExpectedSearchDepth()) {
+            optimal_moves[0] = ponder_moves[0];
+            optimal_moves[1] = ponder_moves[1];
+            completed_depth = ponder_depth;
+            if (report_progress) SendLine("info ponderhit depth " + to_string(ponder_depth));
+            return;
+        }
+        // 再查询局面库
+        int book_depth = ProbeBook(bot_color, optimal_moves);
+        if (book_depth > max(ponder_depth, 0)) {
+            completed_depth = book_depth;
+            if (report_progress) SendLine("info book depth " + to_string(book_depth));
+            return;
+        }
+        tt_generation++;
+        if (ponder_depth > 0) {
+            // 后台思考结果较浅：从它开始继续加深，置换表中后台思考的结果用于排序
+            optimal_moves[0] = ponder_moves[0];
+            optimal_moves[1] = ponder_moves[1];
+            if (report_progress) SendLine("info ponderseed depth " + to_string(ponder_depth));
+            ParallelSearch(ponder_depth);
+        } else {
+            ParallelSearch();
+            last_search_depth = completed_depth;
+            last_search_time_ms = search_time_ms;
+            last_node_limit = node_limit;
+        }
+        StoreBook(bot_color, completed_depth, optimal_moves);
+    }
+}
+
+// 文件模式：从 Con6Input.txt 恢复历史，决策后写入 Con6Output.txt 并退出
+int RunFileMode() {
     freopen("Con6Input.txt", "r", stdin); // 重定向输入到文件
     freopen("Con6Output.txt", "w", stdout); // 重定向输出到文件
     int x0, y0, x1, y1;
@@ -249,71 +1727,305 @@ int main() {
         if (x0 == -1) {
             bot_color = BLACK_PIECE; // 第一回合收到坐标是-1, -1，说明我是黑方
         }
-        if (x0 >= 0) {
-            PlacePiece(x0, y0, x1, y1, -bot_color, false);
-            top_boundary = min(top_boundary, y0);
-            bottom_boundary = max(bottom_boundary, y0);
-            left_boundary = min(left_boundary, x0);
-            right_boundary = max(right_boundary, x0);
-            if (i != 0 || -bot_color == WHITE_PIECE) {
-                top_boundary = min(top_boundary, y1);
-                bottom_boundary = max(bottom_boundary, y1);
-                left_boundary = min(left_boundary, x1);
-                right_boundary = max(right_boundary, x1);
-            }
-        }
+        ApplyMove(x0, y0, x1, y1, -bot_color);
         if (i < turn_id - 1) {
             cin >> x0 >> y0 >> x1 >> y1;
-            if (x0 >= 0) {
-                PlacePiece(x0, y0, x1, y1, bot_color, false);
-                top_boundary = min(top_boundary, y0);
-                bottom_boundary = max(bottom_boundary, y0);
-                left_boundary = min(left_boundary, x0);
-                right_boundary = max(right_boundary, x0);
-                if (i != 0 || bot_color == WHITE_PIECE) {
-                    top_boundary = min(top_boundary, y1);
-                    bottom_boundary = max(bottom_boundary, y1);
-                    left_boundary = min(left_boundary, x1);
-                    right_boundary = max(right_boundary, x1);
-                }
-            }
+            ApplyMove(x0, y0, x1, y1, bot_color);
         }
     }
 
-    // 扩展边界，并生成所有合法棋步
-    if (turn_id == 1) {
-        if (bot_color == BLACK_PIECE) {
-            optimal_moves[0].x = (GRID_SIZE - 1) / 2;
-            optimal_moves[0].y = (GRID_SIZE - 1) / 2;
-            optimal_moves[1].x = -1;
-            optimal_moves[1].y = -1;
-            cout << optimal_moves[0].x << ' ' << optimal_moves[0].y << ' ' << optimal_moves[1].x << ' ' << optimal_moves[1].y << endl;
-            return 0;
-        } else {
-            if (top_boundary - 1 >= 0) top_boundary--;
-            if (bottom_boundary + 1 < GRID_SIZE) bottom_boundary++;
-            if (left_boundary - 1 >= 0) left_boundary--;
-            if (right_boundary + 1 < GRID_SIZE) right_boundary++;
+    search_start_time = chrono::high_resolution_clock::now();
+    Think();
+
+    // 输出决策结果
+    cout << optimal_moves[0].x << ' ' << optimal_moves[0].y << ' ' << optimal_moves[1].x << ' ' << optimal_moves[1].y << endl;
+
+    return 0;
+}
+
+// ---------------- 常驻模式（管道协议） ----------------
+// 每行一条命令，应答同样按行输出：
+//   new                    开始新的一局                 -> ok
+//   play x0 y0 x1 y1       轮到的一方落子（单子时 x1 y1 为 -1） -> ok / error <原因>
+//   go [毫秒]              为轮到的一方搜索（异步）     -> info ... 与 bestmove x0 y0 x1 y1
+//   ponder                 在对方的时间里后台思考（异步），直到收到下一条命令 -> info ponder ...
+//   stop                   立即结束正在进行的搜索或后台思考
+//   set size <N>           设置棋盘大小（6 到 19），并开始新的一局 -> ok
+//   set hash <MB>          设置置换表大小               -> ok
+//   set threads <N>        设置搜索线程数               -> ok
+//   set nodes <N>          设置节点数上限（0 为按时间） -> ok
+//   set tssnodes <N>       威胁空间搜索的节点预算（0 关闭） -> ok
+//   set bookdepth <N>      只写入、只采用不浅于 N 的局面库结果 -> ok
+//   set endgame <N>        空点不多于 N 时精确求解（0 关闭） -> ok
+//   set endgamenodes <N>   残局求解的节点预算           -> ok
+//   set <参数> <值>        设置一个可调参数             -> ok
+//   params                 列出可调参数                 -> param <名称> <值> <下限> <上限> ...，ok
+//   params <路径>          从参数文件载入可调参数       -> ok / error
+//   book <路径> [MB]       打开（或创建）局面库文件     -> ok / error
+//   book off               关闭局面库                   -> ok
+//   isready                同步                         -> readyok
+//   quit                   退出
+
+mutex output_mutex; // 搜索线程与主线程共用标准输出
+thread search_thread; // 正在进行的搜索
+bool pondering = false; // search_thread 是后台思考，任何改变状态的命令都会立即结束它
+
+// 输出一行应答
+void SendLine(const string& line) {
+    if (!report_progress) return; // 文件模式下标准输出是结果文件
+    lock_guard<mutex> lock(output_mutex);
+    cout << line << endl;
+}
+
+// 等待正在进行的搜索结束，abort 为 true 时要求其立即停止
+void FinishSearch(bool abort) {
+    if (search_thread.joinable()) {
+        if (abort || pondering) stop_requested = true;
+        search_thread.join();
+    }
+    stop_requested = false;
+    pondering = false;
+}
+
+// 搜索线程入口：在命令线程局面的副本上决策
+void SearchWorker(shared_ptr<PositionSnapshot> position) {
+    RestorePosition(*position);
+    Think();
+    const SearchTotals& totals = search_totals;
+    long long elapsed = ElapsedMs();
+    ostringstream info;
+    info << "info search threads " << max(search_threads, 1) << " depth " << completed_depth
+         << " nodes " << totals.nodes << " nps " << totals.nodes * 1000 / max(elapsed, 1LL)
+         << " time " << elapsed << " cutoffs " << totals.cutoffs << " timeouts " << totals.timeouts;
+    SendLine(info.str());
+    info.str("");
+    info << "info tt probes " << totals.tt_probes << " hits " << totals.tt_hits
+         << " hitrate " << (totals.tt_probes ? totals.tt_hits * 1000 / totals.tt_probes : 0)
+         << " cutoffs " << totals.tt_cutoffs << " stores " << totals.tt_stores
+         << " overwrites " << totals.tt_overwrites << " fill " << TranspositionFill();
+    SendLine(info.str());
+    ostringstream reply;
+    reply << "bestmove " << optimal_moves[0].x << ' ' << optimal_moves[0].y << ' '
+          << optimal_moves[1].x << ' ' << optimal_moves[1].y;
+    SendLine(reply.str());
+}
+
+// 后台思考线程入口：轮到对方落子，逐个预测对方的应手并为己方（bot_color）搜索。
+// 每轮依次搜索所有预测应手，每轮的时间片翻倍，直到被打断或一轮下来没有应手搜索得更深。
+void PonderWorker(shared_ptr<PositionSnapshot> position) {
+    is_ponder_thread = true;
+    RestorePosition(*position);
+    search_totals = SearchTotals{};
+    int opponent = -bot_color;
+    vector<PonderResult> replies;
+    GenerateLegalMoves(opponent, 2);
+    int candidates = (int)min<size_t>(legal_moves.size(), PONDER_CANDIDATES);
+    for (int i = 0; i < candidates; i++) {
+        for (int j = i + 1; j < candidates; j++) {
+            PonderResult result{};
+            result.reply[0] = legal_moves[i].move;
+            result.reply[1] = legal_moves[j].move;
+            result.score = legal_moves[i].score + legal_moves[j].score;
+            replies.push_back(result);
         }
-    } else {
-        if (top_boundary - 2 >= 0) top_boundary -= 2;
-        else if (top_boundary - 1 >= 0) top_boundary--;
-        if (bottom_boundary + 2 < GRID_SIZE) bottom_boundary += 2;
-        else if (bottom_boundary + 1 < GRID_SIZE) bottom_boundary++;
-        if (left_boundary - 2 >= 0) left_boundary -= 2;
-        else if (left_boundary - 1 >= 0) left_boundary--;
-        if (right_boundary + 2 < GRID_SIZE) right_boundary += 2;
-        else if (right_boundary + 1 < GRID_SIZE) right_boundary++;
     }
-    GenerateLegalMoves(bot_color);
+    stable_sort(replies.begin(), replies.end(),
+                [](const PonderResult& a, const PonderResult& b) { return a.score > b.score; });
+    if (replies.size() > PONDER_REPLIES) replies.resize(PONDER_REPLIES);
 
-    // 决策
-    optimal_moves[0] = legal_moves[0].move;
-    optimal_moves[1] = legal_moves[1].move;
-    if (turn_id != 1) AlphaBetaSearch(-INFINITY_VALUE, INFINITY_VALUE, 2, bot_color);
+    // 棋子数由命令线程维护，后台思考期间命令线程不会修改它，这里临时改动后恢复
+    tt_generation++;
+    for (int slice = PONDER_SLICE_MS; !stop_requested; slice *= 2) {
+        bool deepened = false;
+        for (PonderResult& result : replies) {
+            if (stop_requested) break;
+            for (const Move& stone : result.reply) MakeMove(stone.x, stone.y, opponent);
+            stone_count += 2;
+            result.key = PositionKey(bot_color);
+            GenerateLegalMoves(bot_color, 2);
+            if (legal_moves.size() >= 2) {
+                optimal_moves[0] = result.depth ? result.moves[0] : legal_moves[0].move;
+                optimal_moves[1] = result.depth ? result.moves[1] : legal_moves[1].move;
+                search_start_time = chrono::high_resolution_clock::now();
+                search_time_ms = slice;
+                ParallelSearch();
+                if (completed_depth > result.depth) {
+                    result.depth = completed_depth;
+                    result.moves[0] = optimal_moves[0];
+                    result.moves[1] = optimal_moves[1];
+                    deepened = true;
+                }
+            }
+            stone_count -= 2;
+            for (const Move& stone : result.reply) UnmakeMove(stone.x, stone.y);
+        }
+        if (!deepened) break;
+    }
+    ponder_results = replies;
+    int min_depth = replies.empty() ? 0 : MAX_SEARCH_DEPTH;
+    for (const PonderResult& result : replies) min_depth = min(min_depth, result.depth);
+    ostringstream info;
+    info << "info ponder replies " << replies.size() << " depth " << min_depth << " nodes " << search_totals.nodes;
+    SendLine(info.str());
+}
 
-    // 输出决策结果
-    cout << optimal_moves[0].x << ' ' << optimal_moves[0].y << ' ' << optimal_moves[1].x << ' ' << optimal_moves[1].y << endl;
+// 可调参数改变后，置换表和后台思考中按旧分值得到的结果不再可用
+void DiscardSearchResults() {
+    ponder_results.clear();
+    ClearTranspositionTable();
+}
 
+int RunPipeMode() {
+    ios::sync_with_stdio(false);
+    report_progress = true;
+    ResetGame();
+    string line;
+    while (getline(cin, line)) {
+        istringstream command(line);
+        string name;
+        if (!(command >> name)) continue;
+        if (name == "stop" || name == "quit") {
+            FinishSearch(true);
+            if (name == "quit") break;
+            continue;
+        }
+        if (name == "isready") {
+            SendLine("readyok");
+            continue;
+        }
+        FinishSearch(false); // 其余命令都会修改状态，先等待搜索完成
+        if (name == "new") {
+            ResetGame();
+            ponder_results.clear();
+            ClearTranspositionTable();
+            SendLine("ok");
+        } else if (name == "set") {
+            string option;
+            int value;
+            if (!(command >> option >> value)) {
+                SendLine("error set needs an option and a value");
+            } else if (option == "size" && value >= WINDOW_LENGTH && value <= MAX_GRID_SIZE) {
+                if (value != grid_size) {
+                    SetGridSize(value);
+                    ponder_results.clear();
+                    ClearTranspositionTable();
+                    ClearSolverTable();
+                    // 局面库与棋盘大小绑定
+                    if (book_header != nullptr && book_header->grid_size != (uint32_t)grid_size) CloseBook();
+                }
+                SendLine("ok");
+            } else if (option == "hash" && value > 0) {
+                ResizeTranspositionTable(value);
+                SendLine("ok");
+            } else if (option == "threads" && value > 0) {
+                search_threads = min(value, MAX_THREADS);
+                SendLine("ok");
+            } else if (option == "nodes" && value >= 0) {
+                node_limit = value;
+                SendLine("ok");
+            } else if (option == "tssnodes" && value >= 0) {
+                tss_node_limit = value;
+                SendLine("ok");
+            } else if (option == "bookdepth" && value >= 1) {
+                book_min_depth = value;
+                SendLine("ok");
+            } else if (option == "endgame" && value >= 0 && value <= ENDGAME_MAX_EMPTIES) {
+                endgame_empty_limit = value;
+                SendLine("ok");
+            } else if (option == "endgamenodes" && value > 0) {
+                endgame_node_limit = value;
+                SendLine("ok");
+            } else if (SetParameter(option, value)) {
+                DiscardSearchResults();
+                SendLine("ok");
+            } else {
+                SendLine("error unknown option " + option);
+            }
+        } else if (name == "params") {
+            string path, error;
+            if (!(command >> path)) {
+                for (const Parameter& parameter : parameters) {
+                    SendLine("param " + parameter.name + " " + to_string(*parameter.value) + " " +
+                             to_string(parameter.min_value) + " " + to_string(parameter.max_value));
+                }
+                SendLine("ok");
+            } else {
+                bool loaded = LoadParameters(path, error);
+                DiscardSearchResults(); // 出错前已读到的参数同样生效
+                SendLine(loaded ? "ok" : "error " + error);
+            }
+        } else if (name == "book") {
+            string path;
+            int size_mb = DEFAULT_BOOK_MB;
+            if (!(command >> path)) {
+                SendLine("error book needs a path or off");
+            } else if (path == "off") {
+                CloseBook();
+                SendLine("ok");
+            } else {
+                command >> size_mb;
+                SendLine(OpenBook(path, max(size_mb, 1)) ? "ok" : "error cannot open book " + path);
+            }
+        } else if (name == "play") {
+            int x0, y0, x1 = -1, y1 = -1;
+            if (!(command >> x0 >> y0)) {
+                SendLine("error play needs coordinates");
+                continue;
+            }
+            command >> x1 >> y1;
+            if (x0 < 0 || !ApplyMove(x0, y0, x1, y1, side_to_move)) {
+                SendLine("error illegal move");
+                continue;
+            }
+            side_to_move = -side_to_move;
+            SendLine("ok");
+        } else if (name == "go") {
+            int time_ms = MAX_SEARCH_TIME_MS;
+            command >> time_ms;
+            search_time_ms = max(time_ms, 1);
+            bot_color = side_to_move;
+            search_start_time = chrono::high_resolution_clock::now();
+            auto position = make_shared<PositionSnapshot>();
+            SavePosition(*position);
+            search_thread = thread(SearchWorker, position);
+        } else if (name == "ponder") {
+            // 轮到对方落子时才有意义；开局第一手没有可预测的局面
+            ponder_results.clear();
+            if (stone_count < 2) continue;
+            bot_color = -side_to_move;
+            auto position = make_shared<PositionSnapshot>();
+            SavePosition(*position);
+            pondering = true;
+            search_thread = thread(PonderWorker, position);
+        } else {
+            SendLine("error unknown command " + name);
+        }
+    }
+    FinishSearch(true);
     return 0;
 }
+
+int main(int argc, char* argv[]) {
+    InitZobrist();
+    InitPatternTables();
+    InitParameters();
+    ResizeTranspositionTable(DEFAULT_HASH_MB);
+    bool pipe_mode = false;
+    string book_path;
+    for (int i = 1; i < argc; i++) {
+        string arg = argv[i];
+        if (arg == "--pipe") pipe_mode = true;
+        else if (arg == "--threads" && i + 1 < argc) search_threads = max(1, min(atoi(argv[++i]), MAX_THREADS));
+        else if (arg == "--size" && i + 1 < argc) grid_size = max(WINDOW_LENGTH, min(atoi(argv[++i]), MAX_GRID_SIZE));
+        else if (arg == "--book" && i + 1 < argc) book_path = argv[++i];
+        else if (arg == "--params" && i + 1 < argc) {
+            string error;
+            if (!LoadParameters(argv[++i], error)) cerr << error << endl;
+        }
+    }
+    InitWindows();
+    if (!book_path.empty()) OpenBook(book_path, DEFAULT_BOOK_MB); // 局面库与棋盘大小绑定，在确定大小后打开
+    int result = pipe_mode ? RunPipeMode() : RunFileMode();
+    CloseBook();
+    return result;
+}
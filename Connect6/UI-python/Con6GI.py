@@ -3,11 +3,34 @@ from tkinter import messagebox, ttk
 import threading
 import time
 import os
-import subprocess
 import serial
 import serial.tools.list_ports
 import numpy as np
 
+from engine import EngineProcess, EngineError
+from board_watcher import BoardWatcher
+from serial_link import SerialLink, SerialLinkError
+from metrics import GameMetrics
+from game_record import GameRecordWriter, new_record_path, RESULT_UNKNOWN, RESULT_BLACK, RESULT_WHITE, RESULT_DRAW
+from ui_queue import UIUpdateQueue
+from analysis import analyse, find_winner, BLACK, WHITE, EMPTY
+
+# Con6Input.txt 首行的回合数按定长写入，每回合原地改写而不必重写整个文件
+HISTORY_HEADER = "{:<8}\n"
+# 热力图从棋盘底色渐变到红色；威胁路上的空点用边框标出（我方蓝色，对方红色）
+HEATMAP_BASE = (0xE8, 0xC8, 0x7E)
+HEATMAP_HOT = (0xD8, 0x30, 0x20)
+THREAT_OUTLINES = {"own": "#1E50C8", "opponent": "#C81E1E"}
+
+def board_result(board):
+    """按棋盘判定对局结果：已连成六子的一方胜，下满为和棋，否则为未知"""
+    winner = find_winner(board)
+    if winner != EMPTY:
+        return {BLACK: RESULT_BLACK, WHITE: RESULT_WHITE}[winner]
+    if not (np.asarray(board) == EMPTY).any():
+        return RESULT_DRAW
+    return RESULT_UNKNOWN
+
 class Connect6App:
     def __init__(self, root):
         self.root = root
@@ -16,8 +39,9 @@ class Connect6App:
         self.root.resizable(True, True)
         
         # 游戏参数
-        self.board_size = 9
+        self.board_size = 9  # 棋盘大小，开始游戏时按界面设置更新
         self.wait_time = 2  # 文件稳定等待时间
+        self.book_path = None  # 局面库文件，为 None 时不使用
         self.board = np.zeros((self.board_size, self.board_size), dtype=int)
         self.turn_id = 1
         self.player_color = None  # 1:黑方, 2:白方
@@ -32,6 +56,15 @@ class Connect6App:
         self.bytesize = serial.EIGHTBITS
         self.parity = serial.PARITY_NONE
         self.stopbits = serial.STOPBITS_ONE
+        self.serial_link = None  # 整局保持打开的串口链路
+        
+        # 常驻引擎进程，整局只启动一次
+        self.engine = EngineProcess("Connect6.exe")
+        self.watcher = None  # Input.txt 监视器，开始游戏时创建
+        self.metrics = None  # 本局的指标日志
+        self.current_turn = None  # 当前回合的耗时记录
+        self.game_record = None  # 本局的二进制对局记录，重置后仍保留在 games/ 目录中
+        self.drawn_board = None  # 画布上已绘制的棋盘，用于只重画变化的棋子
         
         # 初始化文件
         self.init_files()
@@ -47,7 +80,6 @@ class Connect6App:
                 f.write("0 " * (self.board_size-1) + "0\n")
         
         open("Con6Input.txt", "w").close()
-        open("Con6Output.txt", "w").close()
         
         # 重置棋盘状态
         self.board = np.zeros((self.board_size, self.board_size), dtype=int)
@@ -90,6 +122,14 @@ class Connect6App:
         ttk.Radiobutton(color_frame, text="白方", variable=self.color_var, 
                         value="white").pack(side=tk.LEFT, padx=5)
         
+        # 棋盘大小设置
+        size_frame = ttk.Frame(control_frame)
+        size_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(size_frame, text="棋盘大小:").pack(side=tk.LEFT)
+        self.size_combo = ttk.Combobox(size_frame, values=[str(n) for n in range(6, 20)], width=5)
+        self.size_combo.pack(side=tk.RIGHT)
+        self.size_combo.set(str(self.board_size))
+        
         # 稳定时间设置
         time_frame = ttk.Frame(control_frame)
         time_frame.pack(fill=tk.X, pady=5)
@@ -98,6 +138,18 @@ class Connect6App:
         self.time_entry = ttk.Entry(time_frame, textvariable=self.time_var, width=5)
         self.time_entry.pack(side=tk.RIGHT)
         
+        # 局面库文件：留空则不使用，否则引擎命中时直接给出、搜索后把结果写入
+        book_frame = ttk.Frame(control_frame)
+        book_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(book_frame, text="局面库:").pack(side=tk.LEFT)
+        self.book_var = tk.StringVar(value="opening.book")
+        ttk.Entry(book_frame, textvariable=self.book_var, width=14).pack(side=tk.RIGHT)
+        
+        # 威胁热力图：按我方在每个空点落子的评分着色，并标出双方威胁路上的空点
+        self.heatmap_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(control_frame, text="显示威胁热力图", variable=self.heatmap_var,
+                        command=self.draw_heatmap).pack(fill=tk.X, pady=5)
+        
         # 开始按钮
         self.start_button = ttk.Button(control_frame, text="开始游戏", command=self.start_game)
         self.start_button.pack(fill=tk.X, pady=5)
@@ -125,6 +177,12 @@ class Connect6App:
         self.baud_combo.pack(side=tk.RIGHT, fill=tk.X, expand=True)
         self.baud_combo.set("115200")
         
+        # 通信协议选择（帧协议带序号、确认和重传；旧协议直接发送坐标并等待返回1）
+        # 现有机械臂固件只支持旧协议，默认不勾选，固件升级后再启用帧协议
+        self.framed_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(serial_frame, text="帧协议(序号/确认/重传)",
+                        variable=self.framed_var).pack(fill=tk.X, pady=5)
+        
         # 状态信息
         status_frame = ttk.LabelFrame(right_frame, text="游戏状态")
         status_frame.pack(fill=tk.X, pady=5)
@@ -132,10 +190,19 @@ class Connect6App:
         self.status_text = tk.Text(status_frame, height=10, width=30)
         self.status_text.pack(fill=tk.BOTH, expand=True)
         self.status_text.config(state=tk.DISABLED)
+        # 工作线程通过队列更新界面，由主循环定时取出
+        self.ui_queue = UIUpdateQueue(self.root, self.status_text)
         
         # 刷新串口按钮
         ttk.Button(right_frame, text="刷新串口", command=self.refresh_ports).pack(fill=tk.X, pady=5)
         
+        # 耗时统计面板（本回合 / 本局平均，单位ms）
+        metrics_frame = ttk.LabelFrame(right_frame, text="耗时统计(ms) 本回合/平均")
+        metrics_frame.pack(fill=tk.X, pady=5)
+        self.metrics_var = tk.StringVar(value="-")
+        ttk.Label(metrics_frame, textvariable=self.metrics_var, justify=tk.LEFT,
+                  font=("Consolas", 9)).pack(fill=tk.X)
+        
         # 绘制棋盘
         self.draw_board()
     
@@ -146,6 +213,51 @@ class Connect6App:
             self.port_combo.current(0)
     
     def draw_board(self):
+        """只重画与上次绘制相比发生变化的棋子，网格和坐标只在第一次绘制"""
+        redraw = self.drawn_board is None
+        if redraw:
+            self.draw_grid()
+            self.drawn_board = np.zeros((self.board_size, self.board_size), dtype=int)
+        changed = np.nonzero(self.board != self.drawn_board)
+        for i, j in zip(*changed):
+            self.canvas.delete(f"stone_{i}_{j}")
+            if self.board[i, j] == 1:  # 黑棋
+                self.draw_piece(j, i, "black")
+            elif self.board[i, j] == 2:  # 白棋
+                self.draw_piece(j, i, "white")
+        self.drawn_board = self.board.copy()
+        if redraw or len(changed[0]):
+            self.draw_heatmap()
+    
+    def draw_heatmap(self):
+        """按局面分析的结果重画热力图（画在网格和棋子下方），未勾选时清除"""
+        self.canvas.delete("heatmap")
+        if not self.heatmap_var.get():
+            return
+        own = self.player_color or BLACK
+        result = analyse(self.board)
+        scores = result.scores[own]
+        cell_size = min(500 // self.board_size, 50)
+        half = cell_size / 2
+        # 分值跨越多个数量级，按对数缩放
+        top = np.log1p(scores.max())
+        if top > 0:
+            heat = np.log1p(scores) / top
+            for i, j in zip(*np.nonzero(scores)):
+                color = "#" + "".join(f"{round(base + (hot - base) * heat[i, j]):02x}"
+                                      for base, hot in zip(HEATMAP_BASE, HEATMAP_HOT))
+                center_x, center_y = 40 + j * cell_size, 40 + i * cell_size
+                self.canvas.create_rectangle(center_x - half, center_y - half, center_x + half, center_y + half,
+                                             fill=color, outline="", tags="heatmap")
+        for color, side in ((own, "own"), (WHITE if own == BLACK else BLACK, "opponent")):
+            for x, y in {cell for threat in result.threats[color] for cell in threat.cells}:
+                center_x, center_y = 40 + x * cell_size, 40 + y * cell_size
+                self.canvas.create_rectangle(center_x - half + 2, center_y - half + 2,
+                                             center_x + half - 2, center_y + half - 2,
+                                             outline=THREAT_OUTLINES[side], width=2, tags="heatmap")
+        self.canvas.tag_lower("heatmap")
+    
+    def draw_grid(self):
         self.canvas.delete("all")
         cell_size = min(500 // self.board_size, 50)
         board_size = self.board_size
@@ -153,43 +265,36 @@ class Connect6App:
         # 绘制坐标轴标签 (0-based)
         for i in range(board_size):
             # 行坐标 (左侧)
-            self.canvas.create_text(20, 30 + i * cell_size, text=str(i), font=("Arial", 10))
+            self.canvas.create_text(20, 30 + i * cell_size, text=str(i), font=("Arial", 10), tags="grid")
             # 列坐标 (顶部)
-            self.canvas.create_text(50 + i * cell_size, 20, text=str(i), font=("Arial", 10))
+            self.canvas.create_text(50 + i * cell_size, 20, text=str(i), font=("Arial", 10), tags="grid")
         
         # 绘制网格线
         for i in range(board_size):
             # 横线
             self.canvas.create_line(40, 40 + i * cell_size, 
                                   40 + (board_size-1) * cell_size, 
-                                  40 + i * cell_size)
+                                  40 + i * cell_size, tags="grid")
             # 竖线
             self.canvas.create_line(40 + i * cell_size, 40, 
                                   40 + i * cell_size, 
-                                  40 + (board_size-1) * cell_size)
-        
-        # 绘制棋子
-        for i in range(board_size):
-            for j in range(board_size):
-                if self.board[i, j] == 1:  # 黑棋
-                    self.draw_piece(j, i, "black")
-                elif self.board[i, j] == 2:  # 白棋
-                    self.draw_piece(j, i, "white")
+                                  40 + (board_size-1) * cell_size, tags="grid")
     
     def draw_piece(self, x, y, color):
         cell_size = min(500 // self.board_size, 50)
         center_x = 40 + x * cell_size
         center_y = 40 + y * cell_size
         radius = cell_size * 0.4
+        tags = ("stone", f"stone_{y}_{x}")
         
         if color == "black":
             self.canvas.create_oval(center_x - radius, center_y - radius, 
                                   center_x + radius, center_y + radius, 
-                                  fill="black", outline="black")
+                                  fill="black", outline="black", tags=tags)
         else:  # white
             self.canvas.create_oval(center_x - radius, center_y - radius, 
                                   center_x + radius, center_y + radius, 
-                                  fill="white", outline="black")
+                                  fill="white", outline="black", tags=tags)
     
     def start_game(self):
         if self.game_started:
@@ -218,6 +323,44 @@ class Connect6App:
             messagebox.showerror("错误", "稳定时间必须是数字")
             return
         
+        self.book_path = self.book_var.get().strip() or None
+        
+        # 获取棋盘大小，改变时按新大小重建文件和画布
+        try:
+            board_size = int(self.size_combo.get())
+        except ValueError:
+            board_size = 0
+        if not 6 <= board_size <= 19:
+            messagebox.showerror("错误", "棋盘大小必须为 6 到 19 的整数")
+            return
+        if board_size != self.board_size:
+            self.board_size = board_size
+            self.init_files()
+            self.drawn_board = None
+            self.draw_board()
+        
+        # 打开串口链路，整局保持连接
+        self.close_serial_link()
+        self.serial_link = SerialLink(
+            port,
+            baudrate=self.baudrate,
+            bytesize=self.bytesize,
+            parity=self.parity,
+            stopbits=self.stopbits,
+            framed=self.framed_var.get(),
+            on_status=self.add_status,
+        )
+        try:
+            self.serial_link.open()
+        except serial.SerialException as e:
+            messagebox.showerror("错误", f"打开串口失败: {str(e)}")
+            return
+        
+        # 创建Input.txt监视器
+        if self.watcher is not None:
+            self.watcher.close()
+        self.watcher = BoardWatcher("Input.txt", self.board_size, self.wait_time)
+        
         # 初始化游戏状态
         self.game_started = True
         self.start_button.config(state=tk.DISABLED)
@@ -229,6 +372,8 @@ class Connect6App:
         game_thread.start()
     
     def reset_game(self):
+        # 重置前按棋盘写入本局结果（未分胜负时保持未知）
+        self.finish_game_record(board_result(self.board))
         self.board = np.zeros((self.board_size, self.board_size), dtype=int)
         self.turn_id = 1
         self.player_color = None
@@ -237,11 +382,16 @@ class Connect6App:
         self.game_over = False
         self.is_first_move = True
         self.start_button.config(state=tk.NORMAL)
+        self.engine.close()
+        self.close_serial_link()
+        if self.metrics is not None:
+            self.metrics.close()
+            self.metrics = None
+        self.close_game_record()
+        self.metrics_var.set("-")
         
         # 清空状态文本
-        self.status_text.config(state=tk.NORMAL)
-        self.status_text.delete(1.0, tk.END)
-        self.status_text.config(state=tk.DISABLED)
+        self.ui_queue.clear_log()
         
         # 重新初始化文件
         self.init_files()
@@ -250,17 +400,82 @@ class Connect6App:
         self.draw_board()
         self.add_status("游戏已重置")
     
+    def finish_game_record(self, result):
+        if self.game_record is not None and result != RESULT_UNKNOWN:
+            self.game_record.finish(result)
+    
+    def check_game_over(self, turn):
+        """按当前棋盘判断是否已分胜负或下满，结束时写入对局结果和本回合指标"""
+        result = board_result(self.board)
+        if result == RESULT_UNKNOWN:
+            return False
+        self.game_over = True
+        self.finish_game_record(result)
+        self.metrics.finish_turn(turn)
+        self.current_turn = None
+        self.add_status({RESULT_BLACK: "本局结束：黑方胜", RESULT_WHITE: "本局结束：白方胜",
+                         RESULT_DRAW: "本局结束：和棋"}[result])
+        return True
+    
+    def close_game_record(self):
+        if self.game_record is not None:
+            self.game_record.close()
+            self.game_record = None
+    
+    def close_serial_link(self):
+        if self.serial_link is not None:
+            self.serial_link.close()
+            self.serial_link = None
+    
+    def update_metrics_panel(self, record):
+        """在面板上显示一个回合各阶段的耗时及本局平均值"""
+        averages = self.metrics.averages() if self.metrics is not None else {}
+        lines = [f"{name:<22}{value:>9.1f} /{averages.get(name, value):>9.1f}"
+                 for name, value in record["spans"].items()]
+        engine = record["engine"]
+        if engine:
+            lines.append(f"深度 {engine.get('search_depth', '-')}  节点 {engine.get('search_nodes', '-')}  "
+                         f"超时 {engine.get('search_timeouts', '-')}")
+        self.metrics_var.set("\n".join(lines))
+    
     def add_status(self, message):
-        self.status_text.config(state=tk.NORMAL)
-        self.status_text.insert(tk.END, f"{time.strftime('%H:%M:%S')} - {message}\n")
-        self.status_text.see(tk.END)
-        self.status_text.config(state=tk.DISABLED)
+        self.ui_queue.log(message)
+    
+    def show_error(self, message):
+        """在主循环中弹出错误对话框（可在工作线程调用）"""
+        self.ui_queue.post(messagebox.showerror, "错误", message)
     
     def game_loop(self):
+        # 本局指标日志（JSON Lines，每回合一行）
+        self.metrics = GameMetrics(
+            player_color=self.player_color, wait_time=self.wait_time, board_size=self.board_size)
+        self.close_game_record()
+        self.game_record = GameRecordWriter(new_record_path(), self.board_size, self.player_color)
+        
+        # 启动引擎并开始新的一局（按界面设置的棋盘大小，搜索线程数取CPU核数）
+        try:
+            start = time.perf_counter()
+            self.engine.set_option("size", self.board_size)
+            self.engine.set_option("threads", os.cpu_count() or 1)
+            self.engine.new_game()
+            self.metrics.write({"type": "engine_start", "ms": (time.perf_counter() - start) * 1000})
+        except EngineError as e:
+            self.add_status(f"启动引擎失败: {str(e)}")
+            self.show_error(f"启动引擎失败: {str(e)}")
+            return
+        
+        # 打开局面库（在设置棋盘大小之后，局面库与棋盘大小绑定）；打不开时照常搜索
+        try:
+            self.engine.open_book(self.book_path)
+            if self.book_path is not None:
+                self.add_status(f"已打开局面库: {self.book_path}")
+        except EngineError as e:
+            self.add_status(f"打开局面库失败，本局不使用: {str(e)}")
+        
         # 根据玩家颜色初始化Con6Input.txt
         if self.player_color == 1:  # 黑方
             with open("Con6Input.txt", "w") as f:
-                f.write("1\n-1 -1 -1 -1\n")
+                f.write(HISTORY_HEADER.format(1) + "-1 -1 -1 -1\n")
             self.add_status("初始化: 黑方先手")
         else:  # 白方
             self.add_status("等待对方先手...")
@@ -272,7 +487,8 @@ class Connect6App:
             if len(diff[0]) == 1:  # 只有一个新增棋子
                 x, y = diff[1][0], diff[0][0]  # 0-based坐标
                 with open("Con6Input.txt", "w") as f:
-                    f.write("1\n{} {} -1 -1\n".format(x, y))
+                    f.write(HISTORY_HEADER.format(1) + "{} {} -1 -1\n".format(x, y))
+                self.record_move(x, y)
                 self.add_status(f"记录对方落子: ({x}, {y})")
                 self.last_board_state = self.board.copy()
                 self.is_first_move = False  # 第一步完成
@@ -280,72 +496,34 @@ class Connect6App:
         # 主游戏循环
         while not self.game_over:
             self.add_status(f"回合 {self.turn_id} 开始")
+            turn = self.current_turn = self.metrics.start_turn(self.turn_id)
             
-            # 调用Connect6.exe
-            self.add_status("调用Connect6.exe...")
+            # 请求引擎决策
+            self.add_status("引擎搜索中...")
             try:
-                subprocess.run(['Connect6.exe'], check=True, timeout=60)
-                self.add_status("Connect6.exe执行成功")
-            except Exception as e:
-                self.add_status(f"执行Connect6.exe失败: {str(e)}")
-                messagebox.showerror("错误", f"执行Connect6.exe失败: {str(e)}")
+                with turn.span("engine_search"):
+                    coords = list(self.engine.go())
+                turn.record_engine(self.engine.last_info)
+                if "ponderhit_depth" in self.engine.last_info:
+                    self.add_status(f"命中后台思考结果 (深度 {self.engine.last_info['ponderhit_depth']})")
+                elif "ponderseed_depth" in self.engine.last_info:
+                    self.add_status(f"后台思考结果较浅 (深度 {self.engine.last_info['ponderseed_depth']})，已继续加深")
+                elif "book_depth" in self.engine.last_info:
+                    self.add_status(f"命中局面库 (深度 {self.engine.last_info['book_depth']})")
+                self.add_status(f"AI推荐落子: ({coords[0]}, {coords[1]}) 和 ({coords[2]}, {coords[3]})")
+            except EngineError as e:
+                self.add_status(f"引擎决策失败: {str(e)}")
+                self.show_error(f"引擎决策失败: {str(e)}")
                 return
             
-            # 读取Con6Output.txt
-            try:
-                with open("Con6Output.txt", "r") as f:
-                    output = f.read().strip().split()
-                    if len(output) < 4:
-                        self.add_status("错误: Con6Output.txt格式不正确")
-                        return
-                    
-                    coords = list(map(int, output[:4]))
-                    self.add_status(f"AI推荐落子: ({coords[0]}, {coords[1]}) 和 ({coords[2]}, {coords[3]})")
-            except Exception as e:
-                self.add_status(f"读取Con6Output.txt失败: {str(e)}")
-                return
-            
-            # 通过串口发送数据 - 严格按需求等待返回"1"
+            # 通过串口发送数据，等待对端确认（超时自动重传，断线自动重连）
             self.add_status("通过串口发送落子数据...")
             try:
-                # 创建串口连接（无限等待模式）
-                ser = serial.Serial(
-                    port=self.port_combo.get(),
-                    baudrate=self.baudrate,
-                    bytesize=self.bytesize,
-                    parity=self.parity,
-                    stopbits=self.stopbits,
-                    timeout= 1 #None  # 无限等待模式
-                )
-                
-                # 发送第一个和第二个坐标
-                ser.write(f"{coords[0]} {coords[1]} {coords[2]} {coords[3]}\n".encode())
-                self.add_status(f"发送坐标: {coords[0]} {coords[1]} {coords[2]} {coords[3]}")
-                self.add_status("等待串口返回1...")
-                
-                # 无限等待返回"1"
-                # while True:
-                #     response = ser.readline().decode().strip()
-                #     if response == "1":
-                #         self.add_status("收到确认: 1")
-                #         break
-                
-                # # 发送第二个坐标
-                # ser.write(f"{coords[2]} {coords[3]}\n".encode())
-                # self.add_status(f"发送坐标: {coords[2]} {coords[3]}")
-                # self.add_status("等待串口返回1...")
-                
-                # 无限等待返回"1"
-                while True:
-                    response = ser.readline().decode().strip()
-                    if response == "1":
-                        self.add_status("收到确认: 1")
-                        break
-                
-                ser.close()
-            except Exception as e:
+                with turn.span("serial_roundtrip"):
+                    self.serial_link.send_move(coords)
+                self.add_status(f"发送坐标并收到确认: {coords[0]} {coords[1]} {coords[2]} {coords[3]}")
+            except SerialLinkError as e:
                 self.add_status(f"串口通信失败: {str(e)}")
-                # return
             
             # 确定预期变化数量（黑方第一步只下一颗棋子）
             if self.is_first_move and self.player_color == 1:
@@ -356,7 +534,8 @@ class Connect6App:
             
             # 等待Input.txt更新（我方落子）
             self.add_status(f"等待我方落子更新，预期变化: {expect_changes}个棋子...")
-            self.wait_for_input_update(expect_changes=expect_changes)
+            with turn.span("wait_own_move"):
+                self.wait_for_input_update(expect_changes=expect_changes, stage="own_move")
             
             # 获取新增的棋子 (0-based坐标)
             diff = np.where(self.board != self.last_board_state)
@@ -368,6 +547,7 @@ class Connect6App:
                 # 添加到Con6Input.txt（后两个为-1）
                 with open("Con6Input.txt", "a") as f:
                     f.write(f"{x1} {y1} -1 -1\n")
+                self.record_move(x1, y1)
                 self.add_status(f"记录我方落子: ({x1}, {y1})")
             elif num_changes == 2:
                 # 更新了两个棋子
@@ -376,17 +556,28 @@ class Connect6App:
                 # 添加到Con6Input.txt
                 with open("Con6Input.txt", "a") as f:
                     f.write(f"{x1} {y1} {x2} {y2}\n")
+                self.record_move(x1, y1, x2, y2)
                 self.add_status(f"记录我方落子: ({x1}, {y1}) 和 ({x2}, {y2})")
             else:
                 self.add_status(f"错误：检测到{num_changes}个变化，预期1或2")
             
             self.last_board_state = self.board.copy()
             
+            if self.check_game_over(turn):
+                break
+            
+            # 对方思考期间让引擎预测对方应手并提前搜索
+            try:
+                self.engine.ponder()
+            except EngineError as e:
+                self.add_status(f"引擎后台思考失败: {str(e)}")
+            
             # 等待Input.txt更新（对方落子）
             # 对方落子总是2个棋子（除非是第一步且对方是黑方，但这种情况已在前面处理）
             expect_changes = 2
             self.add_status(f"等待对方落子，预期变化: {expect_changes}个棋子...")
-            self.wait_for_input_update(expect_changes=expect_changes)
+            with turn.span("wait_opponent_move"):
+                self.wait_for_input_update(expect_changes=expect_changes, stage="opponent_move")
             
             # 获取新增的棋子 (0-based坐标)
             diff = np.where(self.board != self.last_board_state)
@@ -398,6 +589,7 @@ class Connect6App:
                 # 添加到Con6Input.txt（后两个为-1）
                 with open("Con6Input.txt", "a") as f:
                     f.write(f"{x1} {y1} -1 -1\n")
+                self.record_move(x1, y1)
                 self.add_status(f"记录对方落子: ({x1}, {y1})")
             elif num_changes == 2:
                 # 更新了两个棋子
@@ -406,130 +598,60 @@ class Connect6App:
                 # 添加到Con6Input.txt
                 with open("Con6Input.txt", "a") as f:
                     f.write(f"{x1} {y1} {x2} {y2}\n")
+                self.record_move(x1, y1, x2, y2)
                 self.add_status(f"记录对方落子: ({x1}, {y1}) 和 ({x2}, {y2})")
             else:
                 self.add_status(f"错误：检测到{num_changes}个变化，预期1或2")
             
             self.last_board_state = self.board.copy()
             
+            if self.check_game_over(turn):
+                break
+            
             # 更新回合数
             self.turn_id += 1
-            with open("Con6Input.txt", "r") as f:
-                lines = f.readlines()
-            
-            if lines:
-                lines[0] = f"{self.turn_id}\n"
-                with open("Con6Input.txt", "w") as f:
-                    f.writelines(lines)
+            with turn.span("history_file"):
+                with open("Con6Input.txt", "r+") as f:
+                    f.write(HISTORY_HEADER.format(self.turn_id))
             
+            # 写入本回合指标
+            record = self.metrics.finish_turn(turn)
+            self.current_turn = None
+            self.ui_queue.post(self.update_metrics_panel, record)
             self.add_status(f"回合 {self.turn_id-1} 结束\n")
     
-    def wait_for_input_update(self, expect_changes):
+    def record_move(self, x0, y0, x1=-1, y1=-1):
+        """将检测到的落子写入对局记录并同步给常驻引擎"""
+        if self.game_record is not None:
+            self.game_record.append(x0, y0, x1, y1)
+        start = time.perf_counter()
+        try:
+            self.engine.play(x0, y0, x1, y1)
+            if self.current_turn is not None:
+                self.current_turn.add_span("engine_sync", (time.perf_counter() - start) * 1000)
+        except EngineError as e:
+            self.add_status(f"同步落子到引擎失败: {str(e)}")
+    
+    def wait_for_input_update(self, expect_changes, stage=None):
         """
         等待Input.txt更新，并检查变化是否符合要求：
-        1. 连续t秒内棋盘不发生新的变化
+        1. 最后一次写入后t秒内棋盘不发生新的变化
         2. 当前棋盘比上一次记录的棋盘刚好多出指定数量的相同颜色棋子
         """
         self.add_status(f"等待棋盘更新，预期变化: {expect_changes}个棋子")
-        last_change_time = time.time()
-        last_content = self.read_input_file()
-        stable_start = None
-        
-        while True:
-            current_content = self.read_input_file()
-            if current_content is None:
-                time.sleep(0.1)
-                continue
-                
-            # 检查内容是否发生变化
-            if current_content != last_content:
-                self.add_status("检测到文件变化，重置计时器")
-                last_content = current_content
-                last_change_time = time.time()
-                stable_start = None  # 重置稳定计时
-                continue
-            
-            # 如果内容没有变化，检查是否开始计时
-            if stable_start is None:
-                stable_start = time.time()
-                self.add_status(f"开始稳定计时 ({self.wait_time}s)")
-            
-            # if time.time() - stable_start > 5:
-            #     return  # 如果超过5秒没有变化，直接返回
-            
-            # 检查稳定时间是否达到要求
-            if time.time() - stable_start >= self.wait_time:
-                # 解析文件内容到棋盘
-                self.update_board_from_file(current_content)
-                
-                # 计算棋盘变化
-                diff = np.where(self.board != self.last_board_state)
-                changed_positions = list(zip(diff[0], diff[1]))
-                
-                # 检查变化数量是否符合预期
-                if len(changed_positions) != expect_changes:
-                    self.add_status(f"变化数量不符: 预期 {expect_changes}, 实际 {len(changed_positions)}")
-                    # 重置稳定计时
-                    stable_start = time.time()
-                    continue
-                
-                # 检查所有变化位置的棋子颜色是否相同
-                colors = set()
-                for i, j in changed_positions:
-                    if self.board[i, j] != 0:  # 只考虑新增棋子
-                        colors.add(self.board[i, j])
-                
-                if len(colors) != 1:
-                    self.add_status(f"棋子颜色不一致: 找到 {len(colors)} 种颜色")
-                    # 重置稳定计时
-                    stable_start = time.time()
-                    continue
-                
-                # 检查颜色是否有效
-                color_value = colors.pop()
-                if color_value not in (1, 2):
-                    self.add_status(f"无效棋子颜色: {color_value}")
-                    # 重置稳定计时
-                    stable_start = time.time()
-                    continue
-                
-                # 所有检查通过，更新棋盘
-                self.add_status(f"检测到有效更新: {expect_changes}个{color_value}色棋子")
-                self.root.after(0, self.draw_board)
-                return
-            
-            # 检查是否超过最大等待时间（避免无限等待）
-            if time.time() - last_change_time > 300:  # 5分钟超时
-                self.add_status("等待更新超时")
-                return
-                
-            time.sleep(0.1)  # 避免CPU占用过高
-    
-    def read_input_file(self):
-        """读取Input.txt文件内容"""
-        try:
-            with open("Input.txt", "r") as f:
-                return f.read()
-        except Exception as e:
-            self.add_status(f"读取Input.txt失败: {str(e)}")
-            return None
-    
-    def update_board_from_file(self, content):
-        """从文件内容更新棋盘状态 (0-based坐标系统)"""
-        lines = content.strip().split("\n")
-        if len(lines) != self.board_size:
+        snapshot = self.watcher.wait_for_snapshot(
+            self.last_board_state, expect_changes, on_status=self.add_status)
+        if snapshot is None:
             return
-            
-        for i, line in enumerate(lines):
-            values = line.split()
-            if len(values) != self.board_size:
-                return
-                
-            for j, val in enumerate(values):
-                try:
-                    self.board[i, j] = int(val)
-                except ValueError:
-                    pass
+        if stage is not None and self.current_turn is not None:
+            # 区分等待落子被检测到的时间与稳定窗口的时间
+            timing = self.watcher.last_timing
+            self.current_turn.add_span(f"{stage}_detect", timing["detect_ms"])
+            self.current_turn.add_span(f"{stage}_settle", timing["settle_ms"])
+        
+        # 所有检查通过，更新棋盘
+        self.board = snapshot
+        self.ui_queue.post(self.draw_board)
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,154 @@
+"""局面分析：不启动引擎，直接在棋盘数组上评估
+
+棋盘与 Input.txt 的格式相同：board[y, x]（行、列），0 空，1 黑，2 白，6 到 19 路均可。
+棋盘上所有连续六格的“路”（横、竖、两个斜向）按棋盘大小预先编号为下标数组，
+一次取数求和即得到每条路上黑、白的棋子数；再按与引擎落子排序相同的分值表
+（核心算法可调参数 order_self_N / order_opponent_N 的默认值）把每条路的分值累加到路上的空点，
+得到双方在每个空点落子的评分。一条路上有一方的四颗或五颗棋子、没有对方棋子即为该方的威胁，
+与引擎的定义一致。
+
+用法示例：
+    from analysis import analyse, BLACK, WHITE
+    result = analyse(board)
+    result.scores[BLACK]   # 黑方在每个空点落子的评分（进攻 + 防守），形状同 board
+    result.threats[WHITE]  # 白方的威胁，每条为 Threat(路上的空点 ((x, y), ...), 棋子数)
+    result.blocks[WHITE]   # 挡住白方全部威胁至少需要的棋子数（按 3 封顶，大于 2 时白方下一手必胜）
+
+    python analysis.py Input.txt --size 9   # 分析一个棋盘文件
+"""
+import argparse
+import functools
+import time
+from collections import namedtuple
+
+import numpy as np
+
+WINDOW_LENGTH = 6
+EMPTY, BLACK, WHITE = 0, 1, 2
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))  # (dy, dx)：横、竖、两个斜向
+
+# 一条路上只有己方 / 只有对方 n 颗棋子时路上每个空点的得分，下标为 n（与引擎落子排序的默认分值相同）
+ATTACK_SCORES = np.array([0, 20, 45, 50, 1000000, 1000000, 0])
+DEFENSE_SCORES = np.array([0, 1, 15, 30, 900000, 900000, 0])
+
+Threat = namedtuple("Threat", "cells stones")
+Analysis = namedtuple("Analysis", "scores threats blocks winner")
+
+
+@functools.lru_cache(maxsize=None)
+def window_cells(size):
+    """所有路上六个点的扁平下标（y * size + x），形状为 (路数, 6)"""
+    steps = np.arange(WINDOW_LENGTH)
+    windows = []
+    for dy, dx in DIRECTIONS:
+        ys = np.arange(size - (WINDOW_LENGTH - 1) * dy)
+        xs = np.arange(WINDOW_LENGTH - 1 if dx < 0 else 0, size - (WINDOW_LENGTH - 1) * max(dx, 0))
+        y0, x0 = np.meshgrid(ys, xs, indexing="ij")
+        windows.append((y0.reshape(-1, 1) + dy * steps) * size + x0.reshape(-1, 1) + dx * steps)
+    cells = np.concatenate(windows)
+    cells.flags.writeable = False  # 缓存的数组被所有调用共用
+    return cells
+
+
+def window_counts(board):
+    """每条路上黑、白的棋子数，返回 (黑, 白) 两个数组"""
+    board = np.asarray(board)
+    cells = board.ravel()[window_cells(len(board))]
+    return (cells == BLACK).sum(axis=1), (cells == WHITE).sum(axis=1)
+
+
+def cell_scores(board, color, counts=None):
+    """color 方在每个空点落子的评分，形状同 board，已有棋子的点为 0"""
+    board = np.asarray(board)
+    size = len(board)
+    black, white = window_counts(board) if counts is None else counts
+    own, other = (black, white) if color == BLACK else (white, black)
+    line = np.where(other == 0, ATTACK_SCORES[own], 0) + np.where(own == 0, DEFENSE_SCORES[other], 0)
+    scores = np.bincount(window_cells(size).ravel(), weights=np.repeat(line, WINDOW_LENGTH), minlength=size * size)
+    scores = scores.astype(np.int64).reshape(size, size)
+    scores[board != EMPTY] = 0
+    return scores
+
+
+def find_threats(board, color, counts=None):
+    """color 方的威胁路，返回 Threat 列表"""
+    board = np.asarray(board)
+    size = len(board)
+    black, white = window_counts(board) if counts is None else counts
+    own, other = (black, white) if color == BLACK else (white, black)
+    flat = board.ravel()
+    threats = []
+    for window in np.nonzero((own >= WINDOW_LENGTH - 2) & (own < WINDOW_LENGTH) & (other == 0))[0]:
+        cells = window_cells(size)[window]
+        empties = tuple((int(c % size), int(c // size)) for c in cells[flat[cells] == EMPTY])
+        threats.append(Threat(empties, int(own[window])))
+    return threats
+
+
+def blocks_needed(threats):
+    """挡住全部威胁至少需要的棋子数，按 3 封顶"""
+    if not threats:
+        return 0
+    cells = [set(threat.cells) for threat in threats]
+    # 能挡住全部威胁的棋子必有一颗落在第一条威胁路的空点上
+    result = 3
+    for first in cells[0]:
+        rest = [s for s in cells if first not in s]
+        if not rest:
+            return 1
+        if any(all(second in s for s in rest) for second in rest[0]):
+            result = 2
+    return result
+
+
+def find_winner(board, counts=None):
+    """已连成六子的一方，没有时为 EMPTY"""
+    black, white = window_counts(board) if counts is None else counts
+    if (black == WINDOW_LENGTH).any():
+        return BLACK
+    if (white == WINDOW_LENGTH).any():
+        return WHITE
+    return EMPTY
+
+
+def analyse(board):
+    """一次分析双方的落子评分、威胁和胜负"""
+    counts = window_counts(board)
+    threats = {color: find_threats(board, color, counts) for color in (BLACK, WHITE)}
+    return Analysis(
+        scores={color: cell_scores(board, color, counts) for color in (BLACK, WHITE)},
+        threats=threats,
+        blocks={color: blocks_needed(threats[color]) for color in (BLACK, WHITE)},
+        winner=find_winner(board, counts),
+    )
+
+
+def main():
+    from board_watcher import parse_board
+
+    parser = argparse.ArgumentParser(description="六子棋局面分析（不启动引擎）")
+    parser.add_argument("path", nargs="?", default="Input.txt", help="棋盘文件（Input.txt 格式）")
+    parser.add_argument("--size", type=int, default=9, help="棋盘大小")
+    parser.add_argument("--top", type=int, default=5, help="每方列出评分最高的点数")
+    args = parser.parse_args()
+
+    with open(args.path) as f:
+        board = parse_board(f.read(), args.size)
+    if board is None:
+        parser.error(f"{args.path} 不是 {args.size} 路棋盘")
+    start = time.perf_counter()
+    result = analyse(board)
+    elapsed = (time.perf_counter() - start) * 1e6
+    print(f"黑 {int((board == BLACK).sum())} 子，白 {int((board == WHITE).sum())} 子，"
+          f"胜方 {'-黑白'[result.winner]}，分析用时 {elapsed:.0f}us")
+    for color, name in ((BLACK, "黑方"), (WHITE, "白方")):
+        scores = result.scores[color]
+        order = np.argsort(scores, axis=None)[::-1][:args.top]
+        best = "，".join(f"({i % args.size}, {i // args.size}) {scores.flat[i]}" for i in order if scores.flat[i] > 0)
+        print(f"{name}: 威胁 {len(result.threats[color])} 条，需 {result.blocks[color]} 子才能挡住；评分最高 {best or '-'}")
+        for threat in result.threats[color]:
+            print(f"  {threat.stones} 子，空点 {' '.join(f'({x}, {y})' for x, y in threat.cells)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+import numpy as np
+
+# inotify 事件掩码（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class InotifyBackend:
+    """Linux inotify 后端：只在文件被真正写入时唤醒
+
+    监视文件所在目录而不是文件本身，这样写入方以“写临时文件再改名”
+    的方式替换 Input.txt 时也能收到事件。
+    """
+
+    def __init__(self, path):
+        self.name = os.path.basename(path).encode()
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        directory = os.path.dirname(os.path.abspath(path)).encode()
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, directory, mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch 失败")
+
+    def wait(self, timeout):
+        """等待文件写入事件，返回是否发生了写入"""
+        readable, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        if not readable:
+            return False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        changed = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW or name == self.name:
+                changed = True
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class StatBackend:
+    """可移植后端：按间隔 stat 文件，只有修改时间、大小或 inode 变化才算写入"""
+
+    def __init__(self, path, interval=0.05):
+        self.path = path
+        self.interval = interval
+        self.signature = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + max(timeout, 0)
+        while True:
+            signature = self._stat()
+            if signature != self.signature:
+                self.signature = signature
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+
+def parse_board(content, board_size):
+    """将 Input.txt 的内容解析为棋盘数组，格式不正确时返回 None
+
+    每行 board_size 个整数（0 空，1 黑，2 白），共 board_size 行。
+    """
+    lines = content.strip().split("\n")
+    if len(lines) != board_size:
+        return None
+    board = np.zeros((board_size, board_size), dtype=int)
+    for i, line in enumerate(lines):
+        values = line.split()
+        if len(values) != board_size:
+            return None
+        try:
+            board[i] = [int(val) for val in values]
+        except ValueError:
+            return None
+    if not np.isin(board, (0, 1, 2)).all():
+        return None
+    return board
+
+
+def check_update(board, previous, expect_changes):
+    """检查新棋盘相对 previous 的变化，返回 (是否有效, 说明)
+
+    有效的变化是：刚好新增 expect_changes 颗同色棋子，且原有棋子不变。
+    """
+    diff = np.where(board != previous)
+    changed_positions = list(zip(diff[0], diff[1]))
+    if len(changed_positions) != expect_changes:
+        return False, f"变化数量不符: 预期 {expect_changes}, 实际 {len(changed_positions)}"
+    if any(previous[i, j] != 0 for i, j in changed_positions):
+        return False, "已有棋子被改动"
+    colors = {int(board[i, j]) for i, j in changed_positions}
+    if len(colors) != 1:
+        return False, f"棋子颜色不一致: 找到 {len(colors)} 种颜色"
+    return True, f"检测到有效更新: {expect_changes}个{colors.pop()}色棋子"
+
+
+class BoardWatcher:
+    """监视 Input.txt，在棋盘稳定后交出经过校验的棋盘快照
+
+    只在文件被写入时重新读取和解析；一次合法更新之后，若在 debounce 秒内
+    没有新的写入，即认为棋盘已稳定。稳定计时从文件最后一次写入的时间算起，
+    因此文件早已写好时无需再等满整个窗口。
+    """
+
+    def __init__(self, path, board_size, debounce):
+        self.path = path
+        self.board_size = board_size
+        self.debounce = debounce
+        self.backend = self._create_backend(path)
+        # 最近一次等待的耗时(ms)：detect 为开始等待到检测到有效更新，settle 为之后等待稳定的时间
+        self.last_timing = {}
+
+    @staticmethod
+    def _create_backend(path):
+        if sys.platform.startswith("linux"):
+            try:
+                return InotifyBackend(path)
+            except (OSError, AttributeError):
+                pass  # 不支持 inotify（如部分容器或网络文件系统），退回 stat 轮询
+        return StatBackend(path)
+
+    def _read(self):
+        """读取文件内容及最后写入时间，读取失败返回 (None, None)"""
+        try:
+            with open(self.path, "r") as f:
+                content = f.read()
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return None, None
+        return content, min(mtime, time.time())
+
+    def wait_for_snapshot(self, previous, expect_changes, timeout=300, on_status=None):
+        """等待相对 previous 新增 expect_changes 颗同色棋子的稳定棋盘
+
+        返回新的棋盘数组；超过 timeout 秒没有任何写入则返回 None。
+        """
+        report = on_status or (lambda message: None)
+        started = time.time()
+        valid_since = None  # 检测到当前有效快照的时刻
+        last_content = None
+        last_reason = None
+        snapshot = None
+        stable_at = None  # 快照有效时，棋盘被认为稳定的时刻
+        last_write = time.time()
+        changed = True  # 进入时先检查一次当前文件内容
+
+        while True:
+            if changed:
+                content, mtime = self._read()
+                if content is not None and content != last_content:
+                    last_content = content
+                    last_write = time.time()
+                    board = parse_board(content, self.board_size)
+                    if board is None:
+                        valid, reason = False, "棋盘文件格式不正确"
+                    else:
+                        valid, reason = check_update(board, previous, expect_changes)
+                    if valid:
+                        snapshot = board
+                        valid_since = time.time()
+                        stable_at = mtime + self.debounce
+                        report(f"{reason}，等待稳定 ({self.debounce}s)")
+                    else:
+                        snapshot = stable_at = None
+                        if reason != last_reason:
+                            report(reason)
+                        last_reason = reason
+                elif snapshot is not None:
+                    # 内容未变但文件被重写，重新开始稳定计时
+                    stable_at = time.time() + self.debounce
+
+            now = time.time()
+            if snapshot is not None and now >= stable_at:
+                self.last_timing = {
+                    "detect_ms": (valid_since - started) * 1000,
+                    "settle_ms": (now - valid_since) * 1000,
+                }
+                return snapshot
+            if now - last_write > timeout:
+                report("等待更新超时")
+                return None
+            wait = (stable_at - now) if snapshot is not None else timeout - (now - last_write)
+            changed = self.backend.wait(wait)
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,202 @@
+import queue
+import subprocess
+import threading
+
+
+class EngineError(Exception):
+    """引擎进程启动失败、异常退出或返回错误应答"""
+
+
+def parse_info(line):
+    """解析引擎的 info 行为字典
+
+    数字前的单词作为键，不带数字的单词作为后续键的前缀，例如
+    "info tt probes 10 hits 4" 解析为 {"tt_probes": 10, "tt_hits": 4}；
+    pv 之后的坐标解析为元组。
+    """
+    tokens = line.split()[1:]
+    info = {}
+    prefix = ""
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == "pv":
+            info["pv"] = tuple(int(v) for v in tokens[i + 1:])
+            break
+        if i + 1 < len(tokens) and tokens[i + 1].lstrip("-").isdigit():
+            info[prefix + tokens[i]] = int(tokens[i + 1])
+            i += 2
+        else:
+            prefix = tokens[i] + "_"
+            i += 1
+    return info
+
+
+class EngineProcess:
+    """常驻的 Connect6 引擎进程，通过标准输入输出上的行协议通信
+
+    整局只启动一次引擎，之后每回合只需发送 play/go 命令，
+    引擎在两次调用之间保留棋盘状态。
+    """
+
+    def __init__(self, path="Connect6.exe", timeout=60):
+        self.path = path
+        self.timeout = timeout  # 单条命令的最长等待时间(s)
+        self.process = None
+        self.lines = queue.Queue()
+        self.history = []  # 本局已落下的棋步，引擎重启后用于恢复状态
+        self.options = {}  # 已设置的引擎选项，引擎重启后重新设置
+        self.book = None  # 已打开的局面库 (路径, MB)，引擎重启后重新打开
+        self.params_file = None  # 已载入的参数文件，引擎重启后重新载入
+        self.last_info = {}  # 最近一次搜索输出的统计信息
+        self.lock = threading.Lock()
+
+    def start(self):
+        """启动引擎进程（已在运行则直接返回）"""
+        if self.is_running():
+            return
+        try:
+            self.process = subprocess.Popen(
+                [self.path, "--pipe"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+            )
+        except OSError as e:
+            raise EngineError(f"无法启动引擎 {self.path}: {e}") from e
+        self.lines = queue.Queue()
+        reader = threading.Thread(target=self._read_output, args=(self.process, self.lines), daemon=True)
+        reader.start()
+        # 不支持常驻模式的旧版引擎会按文件模式运行一次后直接退出
+        try:
+            self._command("isready", "readyok")
+        except EngineError as e:
+            self.close()
+            raise EngineError(f"{self.path} 不支持常驻模式（--pipe），请按 Core-cpp/readme.md 重新编译引擎") from e
+        # 重启后恢复选项，并按历史恢复棋盘
+        if self.params_file is not None:
+            self._command(f"params {self.params_file}", "ok")
+        for name, value in self.options.items():
+            self._command(f"set {name} {value}", "ok")
+        if self.book is not None:
+            self._command("book {} {}".format(*self.book), "ok")
+        self._command("new", "ok")
+        for move in self.history:
+            self._command("play {} {} {} {}".format(*move), "ok")
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def close(self):
+        """退出引擎进程"""
+        if self.process is None:
+            return
+        try:
+            if self.is_running():
+                self.process.stdin.write("quit\n")
+                self.process.stdin.flush()
+                self.process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+        self.process = None
+
+    def set_option(self, name, value):
+        """设置引擎选项（如 hash 置换表大小，单位 MB）"""
+        with self.lock:
+            self.options[name] = value
+            self.start()
+            self._command(f"set {name} {value}", "ok")
+
+    def parameters(self):
+        """列出引擎的可调参数，返回 {名称: (当前值, 下限, 上限)}"""
+        with self.lock:
+            self.start()
+            lines = []
+            self._command("params", "ok", collect=lines)
+            return {name: (int(value), int(low), int(high))
+                    for name, value, low, high in (line.split()[1:5] for line in lines if line.startswith("param "))}
+
+    def load_parameters(self, path):
+        """从参数文件载入可调参数（每行“名称 值”），引擎重启后重新载入"""
+        with self.lock:
+            self.start()
+            self._command(f"params {path}", "ok")
+            self.params_file = path
+
+    def open_book(self, path, size_mb=16):
+        """打开（不存在则创建）持久化局面库，path 为 None 时关闭"""
+        with self.lock:
+            self.start()
+            if path is None:
+                self.book = None
+                self._command("book off", "ok")
+            else:
+                self._command(f"book {path} {int(size_mb)}", "ok")
+                self.book = (path, int(size_mb))
+
+    def new_game(self):
+        """开始新的一局"""
+        with self.lock:
+            self.history = []
+            self.start()
+            self._command("new", "ok")
+
+    def play(self, x0, y0, x1=-1, y1=-1):
+        """记录轮到的一方的落子（单子时 x1, y1 为 -1）"""
+        move = (int(x0), int(y0), int(x1), int(y1))
+        with self.lock:
+            self.start()
+            self._command("play {} {} {} {}".format(*move), "ok")
+            self.history.append(move)
+
+    def ponder(self):
+        """己方落子已同步后，让引擎在对方的时间里后台思考（不等待应答）
+
+        下一条命令会结束后台思考；对方实际落子与预测相同时，随后的 go 几乎立即返回。
+        """
+        with self.lock:
+            self.start()
+            self._send("ponder")
+
+    def go(self, movetime_ms=None):
+        """为轮到的一方搜索，返回 (x0, y0, x1, y1)"""
+        with self.lock:
+            self.start()
+            command = "go" if movetime_ms is None else f"go {int(movetime_ms)}"
+            self.last_info = {}
+            reply = self._command(command, "bestmove")
+            return tuple(int(v) for v in reply.split()[1:5])
+
+    def _send(self, command):
+        try:
+            self.process.stdin.write(command + "\n")
+            self.process.stdin.flush()
+        except OSError as e:
+            raise EngineError(f"向引擎发送命令失败: {e}") from e
+
+    def _command(self, command, expect, collect=None):
+        """发送一条命令并等待以 expect 开头的应答，collect 不为空时收集其间的其他输出行"""
+        self._send(command)
+        while True:
+            try:
+                line = self.lines.get(timeout=self.timeout)
+            except queue.Empty:
+                raise EngineError(f"等待引擎应答超时: {command}")
+            if line is None:
+                raise EngineError(f"引擎进程已退出: {command}")
+            if line.startswith("info"):
+                self.last_info.update(parse_info(line))
+                continue
+            if line.startswith("error"):
+                raise EngineError(f"引擎拒绝命令 {command}: {line}")
+            if line.startswith(expect):
+                return line
+            if collect is not None:
+                collect.append(line)
+
+    @staticmethod
+    def _read_output(process, lines):
+        """后台线程：逐行读取引擎输出，进程退出时放入 None"""
+        for line in process.stdout:
+            lines.put(line.strip())
+        lines.put(None)
@@ -0,0 +1,116 @@
+"""紧凑的二进制对局记录
+
+每局一个文件（扩展名 .c6r），由定长文件头和定长棋步记录组成：
+
+    文件头 20 字节：magic "C6GR" | 版本 u8 | 棋盘大小 u8 | 我方颜色 u8 | 结果 u8 | 开局时间 f64 | 棋步数 u32
+    棋步 4 字节：x0 y0 x1 y1（int8，单子时 x1 y1 为 -1），黑方先手，双方交替
+
+落子时只在文件末尾追加 4 字节，再原地改写文件头中的棋步数；程序中途退出时，
+读取方以文件头的棋步数与文件实际长度中较小者为准。
+"""
+import itertools
+import os
+import struct
+import time
+from collections import namedtuple
+
+MAGIC = b"C6GR"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBBdI")
+MOVE = struct.Struct("<4b")
+RESULT_OFFSET = 7  # 结果字段在文件头中的偏移
+COUNT_OFFSET = 16  # 棋步数字段在文件头中的偏移
+
+# 我方颜色与结果的取值（与界面中 1 黑 2 白的约定一致）
+NO_COLOR, BLACK, WHITE = 0, 1, 2
+RESULT_UNKNOWN, RESULT_BLACK, RESULT_WHITE, RESULT_DRAW = 0, 1, 2, 3
+
+GameRecord = namedtuple("GameRecord", "path board_size player_color result start_time moves")
+
+
+class GameRecordError(Exception):
+    """文件不是对局记录或已损坏"""
+
+
+class GameRecordWriter:
+    """逐手追加写入一局的记录"""
+
+    def __init__(self, path, board_size, player_color=NO_COLOR, start_time=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.move_count = 0
+        self.file = open(path, "w+b")
+        self.file.write(HEADER.pack(MAGIC, VERSION, board_size, player_color, RESULT_UNKNOWN,
+                                    time.time() if start_time is None else start_time, 0))
+        self.file.flush()
+
+    def append(self, x0, y0, x1=-1, y1=-1):
+        """追加一手棋，并原地更新文件头中的棋步数"""
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(MOVE.pack(int(x0), int(y0), int(x1), int(y1)))
+        self.move_count += 1
+        self.file.seek(COUNT_OFFSET)
+        self.file.write(struct.pack("<I", self.move_count))
+        self.file.flush()
+
+    def finish(self, result):
+        """写入对局结果"""
+        self.file.seek(RESULT_OFFSET)
+        self.file.write(struct.pack("<B", result))
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def new_record_path(directory="games"):
+    """以开局时间命名的记录文件路径
+
+    同一秒内开始的多局依次加后缀 _1、_2……；以独占方式创建空文件占住文件名，
+    不会覆盖之前的记录。
+    """
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, time.strftime("game_%Y%m%d_%H%M%S"))
+    for suffix in itertools.count():
+        path = f"{stem}_{suffix}.c6r" if suffix else f"{stem}.c6r"
+        try:
+            open(path, "xb").close()
+            return path
+        except FileExistsError:
+            continue
+
+
+def read_record(path):
+    """读取一局的记录"""
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise GameRecordError(f"{path}: 文件头不完整")
+        magic, version, board_size, player_color, result, start_time, move_count = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise GameRecordError(f"{path}: 不是对局记录")
+        data = f.read(move_count * MOVE.size)
+    moves = tuple(MOVE.unpack_from(data, offset)
+                  for offset in range(0, len(data) - MOVE.size + 1, MOVE.size))
+    return GameRecord(path, board_size, player_color, result, start_time, moves)
+
+
+def iter_records(source, skip_invalid=True):
+    """逐局读取记录，source 为目录或文件路径的可迭代对象
+
+    每次只在内存中保留一局，可遍历数万局的存档；目录按文件名（即开局时间）排序。
+    """
+    paths = source
+    if isinstance(source, (str, os.PathLike)):
+        names = sorted(entry.name for entry in os.scandir(source)
+                       if entry.is_file() and entry.name.endswith(".c6r"))
+        paths = (os.path.join(source, name) for name in names)
+    for path in paths:
+        try:
+            yield read_record(path)
+        except (OSError, GameRecordError):
+            if not skip_invalid:
+                raise
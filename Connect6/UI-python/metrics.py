@@ -0,0 +1,86 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# 引擎 info 行中记录到指标里的字段
+ENGINE_FIELDS = ("search_depth", "search_nodes", "search_nps", "search_time",
+                 "search_cutoffs", "search_timeouts", "tt_hitrate", "ponderhit_depth", "ponderseed_depth",
+                 "book_depth", "tss_result", "tss_nodes", "endgame_result", "endgame_nodes")
+
+
+class TurnMetrics:
+    """一个回合内各阶段的耗时与引擎计数"""
+
+    def __init__(self, turn_id):
+        self.turn_id = turn_id
+        self.started = time.perf_counter()
+        self.spans = {}  # 阶段名 -> 耗时(ms)
+        self.engine = {}
+
+    @contextmanager
+    def span(self, name):
+        """计时一个阶段，同名阶段的耗时累加"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.spans[name] = self.spans.get(name, 0.0) + elapsed
+
+    def add_span(self, name, elapsed_ms):
+        """记录在别处测得的阶段耗时"""
+        self.spans[name] = self.spans.get(name, 0.0) + elapsed_ms
+
+    def record_engine(self, info):
+        """从引擎 info 统计中提取节点数、剪枝数、深度、超时次数等"""
+        self.engine.update({key: info[key] for key in ENGINE_FIELDS if key in info})
+
+    def to_record(self):
+        return {
+            "type": "turn",
+            "turn": self.turn_id,
+            "time": time.time(),
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "spans": {name: round(value, 3) for name, value in self.spans.items()},
+            "engine": self.engine,
+        }
+
+
+class GameMetrics:
+    """按局写入的 JSON Lines 指标日志，每回合一行
+
+    文件位于 directory 下，以开局时间命名；另保存各阶段的累计耗时供界面显示平均值。
+    """
+
+    def __init__(self, directory="metrics", **game_info):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, time.strftime("game_%Y%m%d_%H%M%S.jsonl"))
+        self.file = open(self.path, "a")
+        self.totals = {}  # 阶段名 -> [累计耗时, 次数]
+        self.write({"type": "game", "time": time.time(), **game_info})
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def start_turn(self, turn_id):
+        return TurnMetrics(turn_id)
+
+    def finish_turn(self, turn):
+        """写入一个回合的指标，返回该回合的记录"""
+        record = turn.to_record()
+        for name, value in record["spans"].items():
+            total = self.totals.setdefault(name, [0.0, 0])
+            total[0] += value
+            total[1] += 1
+        self.write(record)
+        return record
+
+    def averages(self):
+        """各阶段的平均耗时(ms)"""
+        return {name: total / count for name, (total, count) in self.totals.items()}
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
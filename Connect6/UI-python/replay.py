@@ -0,0 +1,140 @@
+"""对局记录回放与分析
+
+逐局流式读取 .c6r 对局记录（见 game_record.py），在记录中的局面上重新运行引擎，
+统计引擎与记录中落子的一致率、搜索深度和耗时，可用于衡量引擎修改前后的变化；
+也可以把每个局面的引擎结果写成 JSON Lines 作为训练数据，或写入局面库。
+
+用法示例：
+    python replay.py games/ --engine ./Connect6 --movetime 200 --every 2
+    python replay.py games/ --engine ./new --json new.json --baseline old.json
+    python replay.py games/ --movetime 5000 --max-ply 8 --book opening.book   # 挖掘开局库
+"""
+import argparse
+import json
+import sys
+import time
+
+from engine import EngineProcess
+from game_record import iter_records
+from selfplay import percentile
+
+
+def analyse_record(engine, record, args, out=None):
+    """回放一局，返回各局面的分析结果"""
+    engine.set_option("size", record.board_size)
+    engine.new_game()
+    results = []
+    for ply, move in enumerate(record.moves):
+        if ply >= args.max_ply:
+            break
+        if ply >= args.skip and (ply - args.skip) % args.every == 0:
+            start = time.perf_counter()
+            found = engine.go(args.movetime)
+            info = engine.last_info
+            result = {
+                "ply": ply,
+                "match": {found[:2], found[2:]} == {move[:2], move[2:]},
+                "latency_ms": (time.perf_counter() - start) * 1000,
+                "depth": info.get("search_depth", 0),
+                "nodes": info.get("search_nodes", 0),
+            }
+            results.append(result)
+            if out is not None:
+                out.write(json.dumps({"game": record.path, "moves": record.moves[:ply], "played": move,
+                                      "engine": found, "score": info.get("score"), **result}) + "\n")
+        engine.play(*move)
+    return results
+
+
+def summarize(results, games, elapsed):
+    latencies = [result["latency_ms"] for result in results]
+    count = max(len(results), 1)
+    return {
+        "games": games,
+        "positions": len(results),
+        "elapsed_s": elapsed,
+        "match_rate": sum(result["match"] for result in results) / count,
+        "depth_mean": sum(result["depth"] for result in results) / count,
+        "nodes_mean": sum(result["nodes"] for result in results) / count,
+        "latency_ms": {name: percentile(latencies, fraction)
+                       for name, fraction in (("p50", 0.5), ("p90", 0.9), ("max", 1.0))},
+    }
+
+
+def compare_with_baseline(summary, baseline, tolerance):
+    """与基准结果比较，返回发现的退化项"""
+    regressions = []
+    if summary["match_rate"] < baseline["match_rate"] - tolerance:
+        regressions.append(f"一致率 {baseline['match_rate']:.3f} -> {summary['match_rate']:.3f}")
+    if summary["depth_mean"] < baseline["depth_mean"] * (1 - tolerance):
+        regressions.append(f"平均深度 {baseline['depth_mean']:.2f} -> {summary['depth_mean']:.2f}")
+    old, new = baseline["latency_ms"]["p50"], summary["latency_ms"]["p50"]
+    if new > old * (1 + tolerance):
+        regressions.append(f"耗时 p50 {old:.1f}ms -> {new:.1f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="六子棋对局记录回放与分析")
+    parser.add_argument("records", nargs="+", help="对局记录目录或 .c6r 文件")
+    parser.add_argument("--engine", default="Connect6.exe", help="引擎路径")
+    parser.add_argument("--movetime", type=int, default=500, help="每个局面的时间预算(ms)")
+    parser.add_argument("--nodes", type=int, default=0, help="按节点数而不是时间停止搜索，结果可复现")
+    parser.add_argument("--threads", type=int, default=1, help="引擎的搜索线程数")
+    parser.add_argument("--every", type=int, default=1, help="每隔几手分析一个局面")
+    parser.add_argument("--skip", type=int, default=2, help="跳过开局的手数")
+    parser.add_argument("--max-ply", type=int, default=1 << 30, help="只分析前若干手")
+    parser.add_argument("--games", type=int, default=0, help="最多分析的局数（0 为全部）")
+    parser.add_argument("--book", help="把搜索结果写入该局面库文件")
+    parser.add_argument("--out", help="将每个局面的分析结果写入 JSON Lines 文件")
+    parser.add_argument("--json", help="将汇总结果写入 JSON 文件")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 汇总比较，发现退化时返回非 0")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="判定退化的相对容差")
+    args = parser.parse_args()
+    args.every = max(args.every, 1)
+
+    engine = EngineProcess(args.engine)
+    engine.set_option("threads", args.threads)
+    if args.nodes:
+        engine.set_option("nodes", args.nodes)
+    if args.book:
+        engine.open_book(args.book)
+    out = open(args.out, "w") if args.out else None
+    results = []
+    games = 0
+    start = time.perf_counter()
+    try:
+        records = (record for source in args.records
+                   for record in iter_records([source] if source.endswith(".c6r") else source))
+        for record in records:
+            if args.games and games >= args.games:
+                break
+            game_results = analyse_record(engine, record, args, out)
+            results.extend(game_results)
+            games += 1
+            matched = sum(result["match"] for result in game_results)
+            print(f"{record.path}: {len(game_results)} 个局面，一致 {matched}", flush=True)
+    finally:
+        engine.close()
+        if out is not None:
+            out.close()
+    summary = summarize(results, games, time.perf_counter() - start)
+    latency = summary["latency_ms"]
+    print(f"分析 {summary['games']} 局 {summary['positions']} 个局面，用时 {summary['elapsed_s']:.1f}s，"
+          f"一致率 {summary['match_rate']:.3f}，平均深度 {summary['depth_mean']:.2f}，"
+          f"平均节点 {summary['nodes_mean']:.0f}，耗时 p50 {latency['p50']:.1f}ms p90 {latency['p90']:.1f}ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(summary, json.load(f), args.tolerance)
+        for item in regressions:
+            print(f"退化: {item}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""机械臂串口替身：在本机创建伪终端，按帧协议应答，用于在没有硬件时测试串口链路
+
+用法（仅限 Linux/macOS）：
+    python robot_sim.py [--drop 0.2] [--nak 0.1] [--delay 0.5] [--legacy]
+启动后打印伪终端路径，在 UI 的串口框中填入该路径即可。
+"""
+import argparse
+import os
+import pty
+import random
+import time
+
+from serial_link import decode_frame, encode_frame
+
+
+def serve(master, drop=0.0, nak=0.0, delay=0.0, legacy=False, on_move=print):
+    """读取主机发来的落子，按设置丢弃、否认或延迟后应答；重复的帧只重新确认，不再执行"""
+    buffer = b""
+    last_seq = None  # 最近一次执行的帧序号
+    while True:
+        try:
+            data = os.read(master, 1024)
+        except OSError:
+            return  # 对端关闭
+        if not data:
+            return
+        buffer += data
+        while b"\n" in buffer:
+            raw, buffer = buffer.split(b"\n", 1)
+            line = raw.decode(errors="replace").strip()
+            if legacy:
+                on_move(line)
+                time.sleep(delay)
+                os.write(master, b"1\n")
+                continue
+            frame = decode_frame(line)
+            if frame is None:
+                continue
+            seq, payload = frame
+            if seq == last_seq:
+                # 主机没收到确认而重传，落子已经执行过
+                os.write(master, encode_frame(0, f"ACK {seq}").encode())
+                continue
+            if random.random() < drop:
+                on_move(f"丢弃 #{seq}: {payload}")
+                continue
+            if random.random() < nak:
+                os.write(master, encode_frame(0, f"NAK {seq}").encode())
+                continue
+            on_move(f"#{seq}: {payload}")
+            last_seq = seq
+            time.sleep(delay)
+            os.write(master, encode_frame(0, f"ACK {seq}").encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="机械臂串口替身")
+    parser.add_argument("--drop", type=float, default=0.0, help="不应答的概率")
+    parser.add_argument("--nak", type=float, default=0.0, help="回复 NAK 的概率")
+    parser.add_argument("--delay", type=float, default=0.0, help="模拟落子耗时(s)")
+    parser.add_argument("--legacy", action="store_true", help="旧固件协议：收到坐标行后回复 1")
+    args = parser.parse_args()
+
+    master, slave = pty.openpty()
+    print(f"串口替身: {os.ttyname(slave)}", flush=True)
+    try:
+        serve(master, args.drop, args.nak, args.delay, args.legacy)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""无界面自对弈与基准测试
+
+通过常驻模式驱动引擎下完整的对局（引擎对引擎，或引擎对随机/脚本对手），
+多局并行分布在进程池中，统计每手耗时分位数、搜索节点数、搜索深度、胜负和每小时对局数。
+
+用法示例：
+    python selfplay.py --games 40 --workers 4 --engine ./Connect6 --opponent random
+    python selfplay.py --games 20 --engine ./new --opponent ./old --json result.json --baseline base.json
+    python selfplay.py --games 200 --movetime 20000 --book opening.book   # 离线深搜填充局面库
+    python selfplay.py --games 20 --size 19 --movetime 2000   # 19 路棋盘
+    python selfplay.py --games 1000 --movetime 200 --record games/   # 保存对局记录，供 replay.py 分析
+    python selfplay.py --games 200 --movetime 100 --params tuned.params   # 调优后的参数对默认参数
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from engine import EngineProcess
+from game_record import GameRecordWriter, RESULT_BLACK, RESULT_WHITE, RESULT_DRAW
+
+DEFAULT_BOARD_SIZE = 9
+BLACK, WHITE = 1, -1
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+def makes_six(board, x, y):
+    """(x, y) 处的棋子是否连成六子"""
+    color = board[x][y]
+    size = len(board)
+    for dx, dy in DIRECTIONS:
+        count = 1
+        for sign in (1, -1):
+            cx, cy = x + sign * dx, y + sign * dy
+            while 0 <= cx < size and 0 <= cy < size and board[cx][cy] == color:
+                count += 1
+                cx, cy = cx + sign * dx, cy + sign * dy
+        if count >= 6:
+            return True
+    return False
+
+
+class EnginePlayer:
+    """由引擎决策的一方"""
+
+    def __init__(self, path, movetime, options, book=None, ponder=False, params=None):
+        self.engine = EngineProcess(path)
+        self.movetime = movetime
+        self.ponder = ponder
+        self.own_move = False  # 下一次 observe 的是否为自己刚走的棋
+        if params:
+            self.engine.load_parameters(params)
+        for name, value in options.items():
+            self.engine.set_option(name, value)
+        if book:
+            self.engine.open_book(book)
+        self.engine.new_game()
+
+    def observe(self, move):
+        self.engine.play(*move)
+        if self.own_move and self.ponder:
+            self.engine.ponder()
+        self.own_move = False
+
+    def choose(self, board, first):
+        self.own_move = True
+        return self.engine.go(self.movetime), self.engine.last_info
+
+    def close(self):
+        self.engine.close()
+
+
+class RandomPlayer:
+    """在已有棋子附近随机落子的对手"""
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def observe(self, move):
+        pass
+
+    def choose(self, board, first):
+        size = len(board)
+        stones = [(x, y) for x in range(size) for y in range(size) if board[x][y]]
+        cells = [(x, y) for x in range(size) for y in range(size) if not board[x][y]
+                 and any(abs(x - sx) <= 2 and abs(y - sy) <= 2 for sx, sy in stones)]
+        if not cells:
+            cells = [(x, y) for x in range(size) for y in range(size) if not board[x][y]]
+        picks = self.rng.sample(cells, 1 if first or len(cells) == 1 else 2)
+        if len(picks) == 1:
+            return (picks[0][0], picks[0][1], -1, -1), {}
+        return (picks[0][0], picks[0][1], picks[1][0], picks[1][1]), {}
+
+    def close(self):
+        pass
+
+
+class ScriptedPlayer:
+    """按脚本文件逐手落子的对手（每行 x0 y0 x1 y1），脚本用完后随机落子"""
+
+    def __init__(self, path, rng):
+        with open(path) as f:
+            self.moves = [tuple(int(v) for v in line.split()[:4]) for line in f if line.strip()]
+        self.fallback = RandomPlayer(rng)
+
+    def observe(self, move):
+        pass
+
+    def choose(self, board, first):
+        while self.moves:
+            move = self.moves.pop(0)
+            if all(board[move[i]][move[i + 1]] == 0 for i in (0, 2) if move[i] >= 0):
+                return move, {}
+        return self.fallback.choose(board, first)
+
+    def close(self):
+        pass
+
+
+def create_player(spec, movetime, options, rng, book=None, ponder=False, params=None):
+    if spec == "random":
+        return RandomPlayer(rng)
+    if spec.startswith("script:"):
+        return ScriptedPlayer(spec[len("script:"):], rng)
+    return EnginePlayer(spec, movetime, options, book, ponder, params)
+
+
+def play_game(task):
+    """在工作进程中下完一局，返回对局记录与统计"""
+    index, config = task
+    rng = random.Random(config["seed"] + index)
+    # 偶数局 A 执黑，奇数局 A 执白
+    a_color = BLACK if index % 2 == 0 else WHITE
+    player_a = create_player(config["engine"], config["movetime"], config["options"], rng,
+                             config["book"], config["ponder"], config.get("params"))
+    player_b = create_player(config["opponent"], config["movetime"], config.get("opponent_options", config["options"]),
+                             rng, config["book"])
+    players = {a_color: ("A", player_a), -a_color: ("B", player_b)}
+
+    size = config["size"]
+    board = [[0] * size for _ in range(size)]
+    record = None
+    if config["record"]:
+        record = GameRecordWriter(os.path.join(config["record"], f"game_{config['seed']}_{index:05d}.c6r"), size)
+    color = BLACK
+    winner = 0
+    moves = []
+    stats = {"A": [], "B": []}
+    try:
+        for turn in range(size * size):
+            name, player = players[color]
+            first = turn == 0
+            if turn < config["random_opening"]:
+                move, info = RandomPlayer(rng).choose(board, first) if not first else \
+                    ((size // 2, size // 2, -1, -1), {})
+            else:
+                start = time.perf_counter()
+                move, info = player.choose(board, first)
+                # 战术检查或残局求解直接给出的棋步没有搜索深度，不计入平均深度
+                solved = "tss_result" in info or info.get("endgame_result") in (0, 1)
+                stats[name].append({
+                    "latency_ms": (time.perf_counter() - start) * 1000,
+                    "nodes": info.get("search_nodes", 0),
+                    "depth": None if solved else info.get("search_depth"),
+                    "ponderhit": "ponderhit_depth" in info,
+                })
+            stones = [(move[i], move[i + 1]) for i in (0, 2) if move[i] >= 0]
+            if not stones or any(board[x][y] for x, y in stones):
+                winner = -color  # 非法落子判负
+                break
+            for x, y in stones:
+                board[x][y] = color
+            moves.append(move)
+            if record is not None:
+                record.append(*move)
+            for _, other in players.values():
+                other.observe(move)
+            if any(makes_six(board, x, y) for x, y in stones):
+                winner = color
+                break
+            if all(board[x][y] for x in range(size) for y in range(size)):
+                break
+            color = -color
+    finally:
+        player_a.close()
+        player_b.close()
+        if record is not None:
+            record.finish({BLACK: RESULT_BLACK, WHITE: RESULT_WHITE, 0: RESULT_DRAW}[winner])
+            record.close()
+    result = "draw" if winner == 0 else ("win" if winner == a_color else "loss")
+    return {"index": index, "a_color": a_color, "result": result, "moves": moves, "stats": stats}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(games, elapsed):
+    """汇总所有对局，结果均以 A 方为视角"""
+    summary = {"games": len(games), "elapsed_s": elapsed,
+               "games_per_hour": len(games) * 3600 / elapsed if elapsed > 0 else 0.0}
+    for key in ("win", "draw", "loss"):
+        summary[key] = sum(game["result"] == key for game in games)
+    summary["score"] = (summary["win"] + 0.5 * summary["draw"]) / max(len(games), 1)
+    for side in ("A", "B"):
+        records = [record for game in games for record in game["stats"][side]]
+        if not records:
+            continue
+        latencies = [record["latency_ms"] for record in records]
+        total_nodes = sum(record["nodes"] for record in records)
+        depths = [record["depth"] for record in records if record["depth"] is not None]
+        summary[side] = {
+            "moves": len(records),
+            "latency_ms": {name: percentile(latencies, fraction)
+                           for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))},
+            "nodes_mean": total_nodes / len(records),
+            "nps": total_nodes * 1000 / max(sum(latencies), 1e-9),
+            "depth_mean": sum(depths) / max(len(depths), 1),
+            "ponderhit_rate": sum(record.get("ponderhit", False) for record in records) / len(records),
+        }
+    return summary
+
+
+def print_summary(summary):
+    print(f"对局 {summary['games']} 局，用时 {summary['elapsed_s']:.1f}s，"
+          f"{summary['games_per_hour']:.0f} 局/小时")
+    print(f"A 方: 胜 {summary['win']} 和 {summary['draw']} 负 {summary['loss']}，得分率 {summary['score']:.3f}")
+    for side in ("A", "B"):
+        if side not in summary:
+            continue
+        data = summary[side]
+        latency = data["latency_ms"]
+        print(f"{side} 方 {data['moves']} 手: 耗时 p50 {latency['p50']:.1f}ms p90 {latency['p90']:.1f}ms "
+              f"p99 {latency['p99']:.1f}ms max {latency['max']:.1f}ms，"
+              f"平均节点 {data['nodes_mean']:.0f}，{data['nps']:.0f} 节点/秒，平均深度 {data['depth_mean']:.2f}，"
+              f"后台思考命中率 {data['ponderhit_rate']:.2f}")
+
+
+def compare_with_baseline(summary, baseline, tolerance):
+    """与基准结果比较，返回发现的退化项"""
+    regressions = []
+    if summary["score"] < baseline["score"] - tolerance:
+        regressions.append(f"得分率 {baseline['score']:.3f} -> {summary['score']:.3f}")
+    if "A" in summary and "A" in baseline:
+        for name in ("p50", "p90"):
+            old, new = baseline["A"]["latency_ms"][name], summary["A"]["latency_ms"][name]
+            if new > old * (1 + tolerance):
+                regressions.append(f"耗时 {name} {old:.1f}ms -> {new:.1f}ms")
+        old, new = baseline["A"]["depth_mean"], summary["A"]["depth_mean"]
+        if new < old * (1 - tolerance):
+            regressions.append(f"平均深度 {old:.2f} -> {new:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="六子棋引擎无界面自对弈与基准测试")
+    parser.add_argument("--engine", default="Connect6.exe", help="被测引擎（A 方）")
+    parser.add_argument("--opponent", default=None,
+                        help="对手：引擎路径、random 或 script:<文件>（默认与 A 方相同的引擎）")
+    parser.add_argument("--games", type=int, default=20, help="对局数（双方轮流执黑）")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="并行进程数")
+    parser.add_argument("--size", type=int, default=DEFAULT_BOARD_SIZE, help="棋盘大小（6 到 19）")
+    parser.add_argument("--movetime", type=int, default=2000, help="每手时间预算(ms)")
+    parser.add_argument("--threads", type=int, default=1, help="每个引擎的搜索线程数")
+    parser.add_argument("--hash", type=int, default=16, help="每个引擎的置换表大小(MB)")
+    parser.add_argument("--ponder", action="store_true", help="A 方在对手的时间里后台思考")
+    parser.add_argument("--params", help="A 方载入的参数文件（如 tune.py 的输出），B 方使用默认参数")
+    parser.add_argument("--book", help="双方共用的局面库文件，搜索结果会写入其中（可用于离线填充开局库）")
+    parser.add_argument("--random-opening", type=int, default=2, help="开局随机落子的手数，使对局各不相同")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--record", help="将每局的对局记录保存到该目录（.c6r 格式，见 game_record.py）")
+    parser.add_argument("--json", help="将汇总结果写入 JSON 文件")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 汇总比较，发现退化时返回非 0")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="判定退化的相对容差")
+    args = parser.parse_args()
+
+    config = {
+        "engine": args.engine,
+        "opponent": args.opponent or args.engine,
+        "movetime": args.movetime,
+        "size": args.size,
+        "options": {"size": args.size, "threads": args.threads, "hash": args.hash},
+        "book": args.book,
+        "ponder": args.ponder,
+        "params": args.params,
+        "random_opening": args.random_opening,
+        "record": args.record,
+        "seed": args.seed,
+    }
+    start = time.perf_counter()
+    games = []
+    with multiprocessing.Pool(max(args.workers, 1)) as pool:
+        for game in pool.imap_unordered(play_game, [(i, config) for i in range(args.games)]):
+            games.append(game)
+            print(f"第 {game['index'] + 1} 局: A 方{'执黑' if game['a_color'] == BLACK else '执白'} "
+                  f"{game['result']}，{len(game['moves'])} 手", flush=True)
+    summary = summarize(games, time.perf_counter() - start)
+    print_summary(summary)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(summary, json.load(f), args.tolerance)
+        for item in regressions:
+            print(f"退化: {item}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
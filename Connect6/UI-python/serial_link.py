@@ -0,0 +1,243 @@
+import threading
+import time
+
+import serial
+
+
+class SerialLinkError(Exception):
+    """串口发送在重传次数用尽后仍未得到确认"""
+
+
+def checksum(payload):
+    """帧校验和：负载各字节异或，两位十六进制"""
+    value = 0
+    for byte in payload.encode():
+        value ^= byte
+    return f"{value:02X}"
+
+
+def encode_frame(seq, payload):
+    """编码一帧：$<序号> <负载>*<校验和>"""
+    body = f"{seq} {payload}"
+    return f"${body}*{checksum(body)}\n"
+
+
+def decode_frame(line):
+    """解码一帧，返回 (序号, 负载)；格式或校验和错误返回 None"""
+    if not line.startswith("$") or "*" not in line:
+        return None
+    body, _, cs = line[1:].rpartition("*")
+    if checksum(body) != cs.strip().upper():
+        return None
+    seq, _, payload = body.partition(" ")
+    if not seq.isdigit():
+        return None
+    return int(seq), payload
+
+
+class SerialLink:
+    """与机械臂之间的持久串口链路
+
+    整局只打开一次串口，由后台线程负责读取应答和断线重连。
+    framed 为 True 时使用带序号的帧协议：发送 "$<序号> <负载>*<校验和>"，
+    对端回复 "ACK <序号>" 或 "NAK <序号>"（也可以是同样格式的帧）；
+    为 False 时兼容旧固件，直接发送负载行，收到 "1" 即视为确认。
+    帧协议下未在 ack_timeout 秒内确认或收到 NAK 时重传，最多重传 retries 次；
+    旧协议没有序号，对端无法丢弃重复行，因此只发送一次并一直等到确认。
+    """
+
+    def __init__(self, port, baudrate=115200, bytesize=serial.EIGHTBITS,
+                 parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE,
+                 framed=True, ack_timeout=5.0, retries=3, reconnect_interval=1.0,
+                 on_status=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.bytesize = bytesize
+        self.parity = parity
+        self.stopbits = stopbits
+        self.framed = framed
+        self.ack_timeout = ack_timeout
+        self.retries = retries
+        self.reconnect_interval = reconnect_interval
+        self.on_status = on_status or (lambda message: None)
+
+        self.serial = None
+        self.seq = 0
+        self.pending = None  # 正在等待确认的序号
+        self.reply = None  # 对 pending 的应答：True 确认，False 否认
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.running = False
+        self.reader = None
+
+    def open(self):
+        """打开串口并启动后台读取线程，首次打开失败时抛出 serial.SerialException"""
+        if self.running:
+            return
+        self._connect()
+        self.running = True
+        self.reader = threading.Thread(target=self._read_loop, daemon=True)
+        self.reader.start()
+
+    def close(self):
+        """停止后台线程并关闭串口"""
+        self.running = False
+        if self.reader is not None:
+            self.reader.join(timeout=2)
+            self.reader = None
+        self._disconnect()
+
+    @property
+    def connected(self):
+        return self.serial is not None and self.serial.is_open
+
+    def send_move(self, coords):
+        """发送一手落子坐标 (x0, y0, x1, y1)，等待对端确认"""
+        self.send(" ".join(str(int(v)) for v in coords))
+
+    def send(self, payload):
+        """发送一条负载并等待确认，重传用尽或链路关闭后抛出 SerialLinkError"""
+        with self.condition:
+            self.seq = self.seq % 9999 + 1
+            seq = self.seq
+            self.pending = seq
+        try:
+            if self.framed:
+                self._send_framed(seq, payload)
+            else:
+                self._send_legacy(seq, payload)
+        finally:
+            with self.condition:
+                self.pending = None
+
+    def _send_framed(self, seq, payload):
+        """帧协议：超时或否认时按原序号重传，对端据序号丢弃重复帧"""
+        line = encode_frame(seq, payload)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.on_status(f"串口第{attempt}次重传 (序号 {seq})")
+            with self.condition:
+                self.reply = None
+            if not self._write(line):
+                # 串口断开，等待后台线程重连后再重传
+                self._wait_connected(self.ack_timeout)
+                continue
+            reply = self._wait_reply(seq)
+            if reply:
+                return
+            if reply is False:
+                self.on_status(f"对端否认 (序号 {seq})")
+        raise SerialLinkError(f"发送 {payload} 未得到确认")
+
+    def _send_legacy(self, seq, payload):
+        """旧协议：只在写入失败（坐标行未发出）时重发，发出后一直等到确认，重发会让机械臂重复落子"""
+        with self.condition:
+            self.reply = None
+        for _ in range(self.retries + 1):
+            if self._write(payload + "\n"):
+                break
+            self._wait_connected(self.ack_timeout)
+        else:
+            raise SerialLinkError(f"发送 {payload} 失败：串口未连接")
+        waited = 0.0
+        while self.running:
+            if self._wait_reply(seq):
+                return
+            waited += self.ack_timeout
+            self.on_status(f"已等待确认 {waited:.0f}s，继续等待")
+        raise SerialLinkError(f"串口已关闭，{payload} 未得到确认")
+
+    def _write(self, line):
+        with self.write_lock:
+            if not self.connected:
+                return False
+            try:
+                self.serial.write(line.encode())
+                self.serial.flush()
+                return True
+            except (serial.SerialException, OSError) as e:
+                self.on_status(f"串口写入失败: {e}")
+                self._close_port()  # 已持有 write_lock，不能再调用 _disconnect
+                return False
+
+    def _wait_reply(self, seq):
+        """等待对 seq 的应答，超时返回 None"""
+        deadline = time.monotonic() + self.ack_timeout
+        with self.condition:
+            while self.reply is None and self.pending == seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            return self.reply
+
+    def _wait_connected(self, timeout):
+        deadline = time.monotonic() + timeout
+        while not self.connected and self.running and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def _connect(self):
+        self.serial = serial.Serial(
+            port=self.port,
+            baudrate=self.baudrate,
+            bytesize=self.bytesize,
+            parity=self.parity,
+            stopbits=self.stopbits,
+            timeout=0.1,
+        )
+
+    def _disconnect(self):
+        with self.write_lock:
+            self._close_port()
+
+    def _close_port(self):
+        """关闭串口，调用方须持有 write_lock"""
+        if self.serial is not None:
+            try:
+                self.serial.close()
+            except (serial.SerialException, OSError):
+                pass
+            self.serial = None
+
+    def _read_loop(self):
+        """后台线程：读取应答行，断线后按间隔重连"""
+        while self.running:
+            if not self.connected:
+                try:
+                    self._connect()
+                    self.on_status("串口已重新连接")
+                except (serial.SerialException, OSError):
+                    time.sleep(self.reconnect_interval)
+                continue
+            try:
+                raw = self.serial.readline()
+            except (serial.SerialException, OSError, TypeError, AttributeError) as e:
+                # 拔出设备时 pyserial 可能抛出各种异常
+                self.on_status(f"串口连接中断: {e}")
+                self._disconnect()
+                continue
+            if raw:
+                self._handle_line(raw.decode(errors="replace").strip())
+
+    def _handle_line(self, line):
+        """解析一行应答并唤醒等待中的发送方"""
+        if not line:
+            return
+        if line.startswith("$"):
+            frame = decode_frame(line)
+            if frame is None:
+                return
+            line = frame[1]
+        words = line.split()
+        with self.condition:
+            if self.pending is None:
+                return
+            if len(words) == 2 and words[0] in ("ACK", "NAK") and words[1].isdigit():
+                if int(words[1]) != self.pending:
+                    return  # 过期应答（对之前重传帧的重复确认）
+                self.reply = words[0] == "ACK"
+            elif line == "1" and not self.framed:
+                self.reply = True
+            else:
+                return
+            self.condition.notify_all()
@@ -0,0 +1,135 @@
+"""串口链路的回归测试：写入失败的串口替身，以及由 robot_sim 应答的伪终端
+
+运行：python -m unittest test_serial_link（伪终端用例仅限 Linux/macOS）
+"""
+import os
+import threading
+import time
+import unittest
+
+import serial
+
+import robot_sim
+from serial_link import SerialLink, SerialLinkError
+
+
+class FailingPort:
+    """write 总是抛出 SerialException 的串口替身"""
+
+    is_open = True
+
+    def write(self, data):
+        raise serial.SerialException("设备已拔出")
+
+    def flush(self):
+        pass
+
+    def readline(self):
+        time.sleep(0.01)
+        return b""
+
+    def close(self):
+        self.is_open = False
+
+
+class FailingLink(SerialLink):
+    def _connect(self):
+        self.serial = FailingPort()
+
+
+def run_with_timeout(target, timeout=5.0):
+    """在线程中执行 target，返回 (是否按时结束, 抛出的异常)"""
+    outcome = {}
+
+    def worker():
+        try:
+            target()
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive(), outcome.get("error")
+
+
+class SerialLinkTest(unittest.TestCase):
+    def test_write_error_does_not_deadlock(self):
+        link = FailingLink("stub", ack_timeout=0.2, retries=2, reconnect_interval=0.05)
+        link.open()
+        finished, error = run_with_timeout(lambda: link.send_move((1, 2, 3, 4)))
+        self.assertTrue(finished, "写入失败后 send_move 被阻塞")
+        self.assertIsInstance(error, SerialLinkError)
+        finished, error = run_with_timeout(link.close)
+        self.assertTrue(finished, "写入失败后 close 被阻塞")
+        self.assertIsNone(error)
+
+    @unittest.skipUnless(hasattr(os, "openpty"), "需要伪终端")
+    def test_pty_roundtrip(self):
+        for legacy in (False, True):
+            with self.subTest(legacy=legacy):
+                master, slave = os.openpty()
+                moves = []
+                server = threading.Thread(target=robot_sim.serve, args=(master,),
+                                          kwargs={"legacy": legacy, "on_move": moves.append}, daemon=True)
+                server.start()
+                link = SerialLink(os.ttyname(slave), framed=not legacy, ack_timeout=2.0, retries=1)
+                try:
+                    link.open()
+                    finished, error = run_with_timeout(lambda: link.send_move((3, 4, 5, 6)))
+                    self.assertTrue(finished)
+                    self.assertIsNone(error)
+                    self.assertTrue(any("3 4 5 6" in move for move in moves))
+                finally:
+                    link.close()
+                    os.close(slave)
+                    os.close(master)
+
+    @unittest.skipUnless(hasattr(os, "openpty"), "需要伪终端")
+    def test_retransmitted_frame_runs_once(self):
+        # 落子慢于确认超时，主机按原序号重传，对端只重新确认、不再执行
+        master, slave = os.openpty()
+        moves = []
+        server = threading.Thread(target=robot_sim.serve, args=(master,),
+                                  kwargs={"delay": 0.5, "on_move": moves.append}, daemon=True)
+        server.start()
+        statuses = []
+        link = SerialLink(os.ttyname(slave), framed=True, ack_timeout=0.2, retries=3, on_status=statuses.append)
+        try:
+            link.open()
+            for coords in ((3, 4, 5, 6), (7, 8, 0, 1)):
+                finished, error = run_with_timeout(lambda: link.send_move(coords))
+                self.assertTrue(finished)
+                self.assertIsNone(error)
+            time.sleep(0.3)
+            self.assertTrue(any("重传" in status for status in statuses))
+            self.assertEqual(moves, ["#1: 3 4 5 6", "#2: 7 8 0 1"])
+        finally:
+            link.close()
+            os.close(slave)
+            os.close(master)
+
+    @unittest.skipUnless(hasattr(os, "openpty"), "需要伪终端")
+    def test_legacy_slow_move_is_not_resent(self):
+        # 旧协议没有序号，机械臂落子慢于确认超时时也不能重发坐标
+        master, slave = os.openpty()
+        moves = []
+        server = threading.Thread(target=robot_sim.serve, args=(master,),
+                                  kwargs={"legacy": True, "delay": 0.6, "on_move": moves.append}, daemon=True)
+        server.start()
+        link = SerialLink(os.ttyname(slave), framed=False, ack_timeout=0.2, retries=3)
+        try:
+            link.open()
+            finished, error = run_with_timeout(lambda: link.send_move((3, 4, 5, 6)))
+            self.assertTrue(finished)
+            self.assertIsNone(error)
+            time.sleep(0.3)
+            self.assertEqual(moves, ["3 4 5 6"])
+        finally:
+            link.close()
+            os.close(slave)
+            os.close(master)
+
+
+if __name__ == "__main__":
+    unittest.main()
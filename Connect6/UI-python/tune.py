@@ -0,0 +1,155 @@
+"""引擎评估参数的自动调优（SPSA 自对弈）
+
+每轮对全部参数同时做 ±1 的随机扰动，得到 θ+ 与 θ- 两组参数，让两者在进程池中对弈若干局
+（双方轮流执黑），按 θ+ 的得分率估计梯度并更新参数。参数在对数空间中调整，
+使数量级不同的权重（如连一与连五的分值）按相同的比例变化。
+
+每轮结束后写入检查点（JSON）和当前参数文件（引擎 --params 或 params 命令可载入），
+中断后用 --resume 从检查点继续。
+
+用法示例：
+    python tune.py --engine ./Connect6 --iterations 500 --games 16 --movetime 100 --out tuned.params
+    python tune.py --engine ./Connect6 --resume tune.json --iterations 1000
+    python tune.py --engine ./Connect6 --params candidates,line_self_3,line_self_4   # 只调部分参数
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from engine import EngineProcess
+from selfplay import DEFAULT_BOARD_SIZE, play_game
+
+# SPSA 的标准衰减指数
+ALPHA = 0.602
+GAMMA = 0.101
+
+
+def engine_parameters(path):
+    """向引擎查询可调参数的默认值与取值范围"""
+    engine = EngineProcess(path)
+    try:
+        return engine.parameters()
+    finally:
+        engine.close()
+
+
+def to_values(theta, bounds):
+    """对数空间中的参数转换为引擎使用的整数值"""
+    values = {}
+    for name, x in theta.items():
+        low, high = bounds[name]
+        values[name] = min(max(int(round(math.exp(x) - 1)), low), high)
+    return values
+
+
+def write_params(path, values):
+    """原子地写入参数文件，每行“名称 值”"""
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(f"# tune.py {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        for name, value in values.items():
+            f.write(f"{name} {value}\n")
+    os.replace(tmp, path)
+
+
+def save_checkpoint(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def run_iteration(pool, state, args, bounds):
+    """一轮 SPSA：θ+ 对 θ- 对弈，返回 θ+ 的得分率"""
+    k = state["iteration"]
+    rng = random.Random(args.seed * 1000003 + k)
+    c_k = args.c / (k + 1) ** GAMMA
+    delta = {name: rng.choice((-1, 1)) for name in state["theta"]}
+    plus = {name: x + c_k * delta[name] for name, x in state["theta"].items()}
+    minus = {name: x - c_k * delta[name] for name, x in state["theta"].items()}
+    common = {"size": args.size, "threads": 1, "hash": args.hash}
+    config = {
+        "engine": args.engine,
+        "opponent": args.engine,
+        "movetime": args.movetime,
+        "size": args.size,
+        "options": {**common, **to_values(plus, bounds)},
+        "opponent_options": {**common, **to_values(minus, bounds)},
+        "book": None,
+        "ponder": False,
+        "random_opening": args.random_opening,
+        "record": None,
+        "seed": args.seed * 1000003 + k * args.games,
+    }
+    games = pool.map(play_game, [(i, config) for i in range(args.games)])
+    score = sum({"win": 1.0, "draw": 0.5, "loss": 0.0}[game["result"]] for game in games) / len(games)
+
+    # 得分率 y+ = score, y- = 1 - score，梯度估计 (y+ - y-) / (2 c_k δ)
+    a_k = args.a / (k + 1 + args.A) ** ALPHA
+    for name in state["theta"]:
+        low, high = bounds[name]
+        x = state["theta"][name] + a_k * (2 * score - 1) / (2 * c_k * delta[name])
+        state["theta"][name] = min(max(x, math.log(low + 1)), math.log(high + 1))
+    state["iteration"] = k + 1
+    state["history"].append({"iteration": k, "score": score, "games": len(games)})
+    return score
+
+
+def main():
+    parser = argparse.ArgumentParser(description="六子棋引擎评估参数的 SPSA 自对弈调优")
+    parser.add_argument("--engine", default="Connect6.exe", help="引擎路径")
+    parser.add_argument("--iterations", type=int, default=200, help="总轮数（续跑时包括已完成的轮数）")
+    parser.add_argument("--games", type=int, default=16, help="每轮 θ+ 对 θ- 的对局数（取偶数，双方轮流执黑）")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="并行进程数")
+    parser.add_argument("--size", type=int, default=DEFAULT_BOARD_SIZE, help="棋盘大小（6 到 19）")
+    parser.add_argument("--movetime", type=int, default=100, help="每手时间预算(ms)")
+    parser.add_argument("--hash", type=int, default=4, help="每个引擎的置换表大小(MB)")
+    parser.add_argument("--random-opening", type=int, default=4, help="开局随机落子的手数，使对局各不相同")
+    parser.add_argument("--params", help="只调优这些参数（逗号分隔），默认全部")
+    parser.add_argument("--a", type=float, default=0.5, help="SPSA 步长系数 a（对数空间）")
+    parser.add_argument("--c", type=float, default=0.2, help="SPSA 扰动幅度 c（对数空间，0.2 约为 ±20%）")
+    parser.add_argument("--A", type=float, default=None, help="SPSA 步长稳定常数 A（默认为总轮数的 10%）")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--checkpoint", default="tune.json", help="检查点文件")
+    parser.add_argument("--resume", help="从该检查点继续")
+    parser.add_argument("--out", default="tuned.params", help="每轮结束后写入当前参数的文件")
+    args = parser.parse_args()
+    if args.A is None:
+        args.A = args.iterations * 0.1
+
+    parameters = engine_parameters(args.engine)
+    bounds = {name: (low, high) for name, (_, low, high) in parameters.items()}
+    if args.resume:
+        with open(args.resume) as f:
+            state = json.load(f)
+        unknown = set(state["theta"]) - set(bounds)
+        if unknown:
+            parser.error(f"引擎不支持检查点中的参数: {', '.join(sorted(unknown))}")
+        print(f"从第 {state['iteration']} 轮继续")
+    else:
+        names = args.params.split(",") if args.params else list(parameters)
+        unknown = set(names) - set(bounds)
+        if unknown:
+            parser.error(f"未知参数: {', '.join(sorted(unknown))}")
+        state = {"iteration": 0, "theta": {name: math.log(parameters[name][0] + 1) for name in names},
+                 "history": []}
+
+    with multiprocessing.Pool(max(args.workers, 1)) as pool:
+        while state["iteration"] < args.iterations:
+            start = time.perf_counter()
+            score = run_iteration(pool, state, args, bounds)
+            values = to_values(state["theta"], bounds)
+            save_checkpoint(args.checkpoint, state)
+            write_params(args.out, values)
+            changed = ", ".join(f"{name} {parameters[name][0]}->{value}" for name, value in values.items()
+                                if value != parameters[name][0])
+            print(f"第 {state['iteration']} 轮: θ+ 得分率 {score:.3f}，用时 {time.perf_counter() - start:.1f}s"
+                  f"{'，' + changed if changed else ''}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import queue
+import time
+import traceback
+
+# 界面刷新周期(ms)
+UI_POLL_MS = 50
+# 状态栏最多保留的行数
+MAX_STATUS_LINES = 500
+
+
+def status_line(message):
+    return f"{time.strftime('%H:%M:%S')} - {message}\n"
+
+
+class UIUpdateQueue:
+    """工作线程与 Tk 主循环之间的界面更新队列
+
+    Tk 不是线程安全的，工作线程只能把更新放入队列，由主循环定时取出执行。
+    同一批中的多条状态信息合并为一次写入，状态栏只保留最近的若干行。
+    """
+
+    def __init__(self, root, status_text, interval=UI_POLL_MS, max_lines=MAX_STATUS_LINES):
+        self.root = root
+        self.status_text = status_text
+        self.interval = interval
+        self.max_lines = max_lines
+        self.updates = queue.Queue()
+        self.closed = False
+        self.root.after(self.interval, self.drain)
+
+    def log(self, message):
+        """追加一条状态信息（可在任意线程调用）"""
+        self.updates.put((None, status_line(message)))
+
+    def post(self, callback, *args):
+        """在主循环中执行 callback(*args)（可在任意线程调用）"""
+        self.updates.put((callback, args))
+
+    def clear_log(self):
+        """清空状态栏，并丢弃尚未写入的状态信息（在主线程调用）"""
+        self.take_pending()
+        self.status_text.config(state="normal")
+        self.status_text.delete("1.0", "end")
+        self.status_text.config(state="disabled")
+
+    def take_pending(self):
+        """取出队列中所有的更新，返回 (状态信息列表, 回调列表)"""
+        lines, callbacks = [], []
+        while True:
+            try:
+                callback, payload = self.updates.get_nowait()
+            except queue.Empty:
+                return lines, callbacks
+            if callback is None:
+                lines.append(payload)
+            else:
+                callbacks.append((callback, payload))
+
+    def drain(self):
+        """由主循环定时调用：按入队顺序执行回调，并一次写入这一批状态信息"""
+        if self.closed:
+            return
+        try:
+            lines, callbacks = self.take_pending()
+            for callback, args in callbacks:
+                try:
+                    callback(*args)
+                except Exception as e:
+                    # 单个界面操作出错时记录下来继续执行，不能让刷新循环停下
+                    traceback.print_exc()
+                    name = getattr(callback, "__name__", repr(callback))
+                    lines.append(status_line(f"界面更新 {name} 出错: {e!r}"))
+            if lines:
+                self.write_lines(lines[-self.max_lines:])
+        finally:
+            self.root.after(self.interval, self.drain)
+
+    def write_lines(self, lines):
+        self.status_text.config(state="normal")
+        self.status_text.insert("end", "".join(lines))
+        # Text 末尾总有一个换行，行数比实际多 1
+        excess = int(self.status_text.index("end-1c").split(".")[0]) - 1 - self.max_lines
+        if excess > 0:
+            self.status_text.delete("1.0", f"{excess + 1}.0")
+        self.status_text.see("end")
+        self.status_text.config(state="disabled")
+
+    def close(self):
+        self.closed = True